@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Throughput and memory of a full export against a local fake bunq api.
+
+    python -m benchmarks.bench_fetch --accounts 3 --payments 100000 \\
+        --latency 0.05 --output result.json
+    python -m benchmarks.bench_fetch ... --baseline result.json
+
+Reports the time of every stage (listing accounts, fetching and serializing
+the payment pages, building the dataframes and writing the exports), pages/s,
+rows/s and the peak RSS. --prefetch N requests N pages ahead while the
+current one is serialized. With --baseline the run fails if a stage got slower than
+the baseline by more than --tolerance.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import resource
+import sys
+import tempfile
+import time
+
+from bunq.sdk.json import converter
+
+from bunqexport import export
+from bunqexport.connection import use_connection_pool
+from bunqexport.ratelimit import RateLimiter
+from bunqexport.tests import fakebunq
+
+# pylint: disable=protected-access
+
+
+class _Stages:
+    """collects the duration of the stages of a run"""
+
+    def __init__(self):
+        self.durations = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        yield
+        self.durations[name] = self.durations.get(name, 0) + (
+            time.perf_counter() - start
+        )
+
+
+def _run(args, stages):
+    """Export all accounts of the fake server, return pages and rows"""
+    pages = rows = 0
+    with stages("accounts"):
+        accounts = export.Accounts()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for account_id, account_name in accounts.ids():
+            with stages("fetch"):
+                records = []
+                for page in export._iter_pages(
+                    account_id, args.page_size, prefetch=args.prefetch
+                ):
+                    pages += 1
+                    records.extend(converter.serialize(p) for p in page)
+            rows += len(records)
+            with stages("normalize"):
+                frame = export.Payments.from_records(reversed(records))
+            del records
+            with stages("export"):
+                export._export(tmpdir + "/bunq", frame, None, account_name, "raw")
+    return pages, rows
+
+
+def _report(args, stages, pages, rows):
+    total = sum(stages.durations.values())
+    result = {
+        "accounts": args.accounts,
+        "payments": args.payments,
+        "latency": args.latency,
+        "prefetch": args.prefetch,
+        "pages": pages,
+        "rows": rows,
+        "pages_per_second": pages / stages.durations["fetch"],
+        "rows_per_second": rows / total,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": stages.durations,
+    }
+    for name, duration in stages.durations.items():
+        print(f"{name:10} {duration:9.3f}s")
+    print(f"{'total':10} {total:9.3f}s")
+    print(
+        f"{pages} pages, {rows} rows: {result['pages_per_second']:.1f} pages/s,"
+        f" {result['rows_per_second']:.0f} rows/s,"
+        f" peak RSS {result['peak_rss_mib']:.1f} MiB"
+    )
+    return result
+
+
+def _regressions(result, baseline, tolerance):
+    """Return the stages slower than in 'baseline'"""
+    return [
+        f"{name}: {duration:.3f}s > {baseline['stages'][name]:.3f}s"
+        for name, duration in result["stages"].items()
+        if name in baseline["stages"]
+        and duration > baseline["stages"][name] * (1 + tolerance)
+    ]
+
+
+def main():
+    """benchmark entrypoint"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", default=3, type=int)
+    parser.add_argument("--payments", default=20000, type=int, help="per account")
+    parser.add_argument("--latency", default=0.0, type=float, help="per request")
+    parser.add_argument("--page-size", default=200, type=int)
+    parser.add_argument("--prefetch", default=0, type=int, help="pages ahead")
+    parser.add_argument(
+        "--no-pool", action="store_true", help="new connection per request"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="keep the rate limits of bunq (the fake server has none)",
+    )
+    parser.add_argument("--output", help="write the result as json")
+    parser.add_argument("--baseline", help="compare with a previous --output")
+    parser.add_argument("--tolerance", default=0.2, type=float)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    fake_accounts = {n + 1: args.payments for n in range(args.accounts)}
+    with fakebunq.FakeBunqProcess(fake_accounts, latency=args.latency) as fake:
+        fake.install()
+        if not args.no_pool:
+            use_connection_pool()
+        if not args.rate_limit:
+            export._rate_limiter = RateLimiter(None)
+        stages = _Stages()
+        pages, rows = _run(args, stages)
+    result = _report(args, stages, pages, rows)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fobj:
+            json.dump(result, fobj, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fobj:
+            regressions = _regressions(result, json.load(fobj), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
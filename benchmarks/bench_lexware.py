@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Compare the full lexware csv with the columns of the bunq profile of
+`Vorlagen.dat`.
+
+    python -m benchmarks.bench_lexware --payments 100000
+"""
+
+import argparse
+import io
+import time
+
+from bunq.sdk.json import converter
+
+from bunqexport import export, lexware
+from bunqexport.tests import fakebunq
+
+
+def _measure(payments, mode):
+    fobj = io.StringIO()
+    start = time.perf_counter()
+    payments.to_csv(fobj, mode)
+    return time.perf_counter() - start, len(fobj.getvalue().encode())
+
+
+def main():
+    """benchmark entrypoint"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", default=20000, type=int)
+    parser.add_argument("--vorlagen", default="Vorlagen.dat")
+    args = parser.parse_args()
+
+    payments = export.Payments.from_records(
+        converter.serialize(p)
+        for p in fakebunq.sdk_payments(fakebunq.iter_payments(1, args.payments))
+    )
+    for name, mode in (
+        ("lexware", "lexware"),
+        ("profile", lexware.read_profile(args.vorlagen)),
+    ):
+        duration, size = _measure(payments, mode)
+        print(
+            f"{name:8} {duration:8.3f}s {size / 2**20:8.1f} MiB"
+            f" {args.payments / duration:10.0f} payments/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
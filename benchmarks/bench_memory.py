@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Report the memory of `Payments` before and after `Payments.compact`.
+
+    python -m benchmarks.bench_memory --payments 100000 --accounts 5
+"""
+
+import argparse
+
+import pandas
+from bunq.sdk.json import converter
+
+from bunqexport import export
+from bunqexport.tests import fakebunq
+
+
+def _history(accounts, count):
+    frames = []
+    for account_id in range(1, accounts + 1):
+        payments = fakebunq.sdk_payments(
+            fakebunq.iter_payments(account_id, count, seed=account_id)
+        )
+        frames.append(
+            export.Payments.from_records(converter.serialize(p) for p in payments)
+        )
+    return export.Payments(pandas.concat(p.payments for p in frames))
+
+
+def main():
+    """benchmark entrypoint"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", default=20000, type=int, help="per account")
+    parser.add_argument("--accounts", default=3, type=int)
+    args = parser.parse_args()
+
+    payments = _history(args.accounts, args.payments)
+    before = payments.payments.memory_usage(deep=True, index=False)
+    compact = payments.compact()
+    after = compact.memory_usage(deep=True, index=False)
+    print(f"{'column':36} {'dtype':>14} {'before':>10} {'after':>10}")
+    for name, size in before.items():
+        new_name = name
+        if name in export._AMOUNT_COLUMNS:  # pylint: disable=protected-access
+            new_name = name[: -len("value")] + "cents"
+        if new_name in after:
+            dtype, new_size = str(compact[new_name].dtype), after[new_name]
+        else:
+            dtype, new_size = "dropped", 0
+        print(
+            f"{new_name:36} {dtype:>14} {size / 2**10:8.0f}KiB"
+            f" {new_size / 2**10:8.0f}KiB"
+        )
+    print(
+        f"{len(payments)} payments: {before.sum() / 2**20:.1f} MiB ->"
+        f" {after.sum() / 2**20:.1f} MiB"
+        f" ({1 - after.sum() / before.sum():.0%} less)"
+    )
+
+
+if __name__ == "__main__":
+    main()
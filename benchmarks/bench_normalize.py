@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare building `Payments` via json round trip and via the column builder.
+
+    python -m benchmarks.bench_normalize --payments 100000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import pandas
+from bunq.sdk.json import converter
+
+from bunqexport import export
+from bunqexport.tests import fakebunq
+
+
+def _json_round_trip(payments):
+    data = "[" + ",".join(p.to_json() for p in payments) + "]"
+    return pandas.json_normalize(json.loads(data))
+
+
+def _column_builder(payments):
+    return export._records_to_dataframe(  # pylint: disable=protected-access
+        converter.serialize(p) for p in payments
+    )
+
+
+def _measure(func, payments):
+    start = time.perf_counter()
+    result = func(payments)
+    duration = time.perf_counter() - start
+    # a second run for memory, tracing slows down the first one too much
+    tracemalloc.start()
+    func(payments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def main():
+    """benchmark entrypoint"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", default=20000, type=int)
+    args = parser.parse_args()
+
+    payments = fakebunq.sdk_payments(fakebunq.iter_payments(1, args.payments))
+    results = {}
+    for func in (_json_round_trip, _column_builder):
+        frame, duration, peak = _measure(func, payments)
+        results[func.__name__] = frame
+        print(
+            f"{func.__name__:18} {duration:8.3f}s {peak / 2**20:8.1f} MiB"
+            f" {args.payments / duration:10.0f} payments/s"
+        )
+    pandas.testing.assert_frame_equal(
+        results["_json_round_trip"], results["_column_builder"]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Totals of payments, kept up to date without the full history.
+
+The totals (sum and count of the amounts) per account, month, type,
+counterparty and currency and the closing balance of every account and month
+are saved in a sqlite database. `Aggregates.update` adds only the payments
+not counted before, so it can be fed with every fetched page or export,
+overlapping ones included; reports are read from the saved totals.
+"""
+
+import sqlite3
+import threading
+
+from . import export
+
+__all__ = ["KEYS", "Aggregates"]
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counted (
+    id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS totals (
+    monetary_account_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    counterparty TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (monetary_account_id, month, type, counterparty, currency)
+);
+CREATE TABLE IF NOT EXISTS closing (
+    monetary_account_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    balance_cents INTEGER NOT NULL,
+    PRIMARY KEY (monetary_account_id, month)
+);
+"""
+
+# the totals are kept per these keys (and currency)
+KEYS = ("monetary_account_id", "month", "type", "counterparty")
+
+
+def _text(frame, column):
+    """Return 'column' of 'frame' as strings, empty if missing"""
+    if column not in frame:
+        return ""
+    return frame[column].astype(object).fillna("").astype(str).to_numpy()
+
+
+class Aggregates:
+    """
+    sqlite database with the totals of all payments counted so far
+
+    may be shared by the threads fetching accounts in parallel
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # ids of the payments of an update, to look up only those
+        self._db.execute("CREATE TEMP TABLE given (id INTEGER PRIMARY KEY)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database"""
+        self._db.close()
+
+    def _counted(self, ids):
+        """Return the ids of the already counted payments among 'ids'"""
+        with self._db:
+            self._db.execute("DELETE FROM given")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO given VALUES (?)", ((int(i),) for i in ids)
+            )
+            rows = self._db.execute("SELECT id FROM counted JOIN given USING (id)")
+            return [row[0] for row in rows]
+
+    def update(self, frame):
+        """Add the flattened payments in 'frame' which are not counted yet,
+        return their number"""
+        import pandas
+
+        if frame.empty:
+            return 0
+        with self._lock:
+            ids = frame["id"].astype("int64")
+            new = frame[~ids.isin(self._counted(ids))].drop_duplicates("id")
+            if new.empty:
+                return 0
+            rows = pandas.DataFrame(
+                {
+                    "monetary_account_id": new["monetary_account_id"].astype("int64"),
+                    "month": pandas.to_datetime(new["created"]).dt.strftime("%Y-%m"),
+                    "type": _text(new, "type"),
+                    "counterparty": _text(new, "counterparty_alias.name"),
+                    "currency": _text(new, "amount.currency"),
+                    "cents": export._amount_cents(new, "amount.value"),
+                    "id": new["id"].astype("int64"),
+                    "balance_cents": export._amount_cents(
+                        new, "balance_after_mutation.value"
+                    ),
+                }
+            )
+            totals = rows.groupby(list(KEYS) + ["currency"], sort=False)["cents"]
+            totals = totals.agg(["sum", "count"]).reset_index()
+            closing = rows.sort_values("id").groupby(
+                ["monetary_account_id", "month"], sort=False
+            )
+            closing = closing.tail(1)[
+                ["monetary_account_id", "month", "id", "currency", "balance_cents"]
+            ]
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO totals VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (monetary_account_id, month, type, counterparty,"
+                    " currency) DO UPDATE SET cents = cents + excluded.cents,"
+                    " count = count + excluded.count",
+                    totals.astype(object).itertuples(index=False),
+                )
+                self._db.executemany(
+                    "INSERT INTO closing VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (monetary_account_id, month) DO UPDATE SET"
+                    " id = excluded.id, currency = excluded.currency,"
+                    " balance_cents = excluded.balance_cents"
+                    " WHERE excluded.id > closing.id",
+                    closing.astype(object).itertuples(index=False),
+                )
+                self._db.executemany(
+                    "INSERT INTO counted VALUES (?)",
+                    ((int(i),) for i in rows["id"]),
+                )
+        return len(rows)
+
+    def _query(self, sql):
+        import pandas
+
+        with self._lock:
+            return pandas.read_sql_query(sql, self._db)
+
+    def totals(self, by=("monetary_account_id", "month")):
+        """Return the sum ('cents', 'amount') and count of the amounts per
+        currency and the keys 'by' (of `KEYS`) as DataFrame"""
+        unknown = set(by) - set(KEYS)
+        if unknown:
+            raise ValueError(f"unknown keys {sorted(unknown)}, use {KEYS}")
+        keys = list(by) + ["currency"]
+        frame = self._query("SELECT * FROM totals")
+        frame = frame.groupby(keys, as_index=False)[["cents", "count"]].sum()
+        frame["amount"] = frame["cents"] / 100
+        return frame
+
+    def closing_balances(self, monthly=False):
+        """Return the balance after the newest counted payment of every
+        account, or of every account and month if 'monthly'"""
+        frame = self._query("SELECT * FROM closing ORDER BY monetary_account_id, month")
+        if not monthly:
+            frame = frame.groupby("monetary_account_id", as_index=False).last()
+        frame["balance"] = frame["balance_cents"] / 100
+        return frame
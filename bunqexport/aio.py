@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" asyncio engine to fetch payments and accounts (requires aiohttp).
+
+`AsyncClient` talks to the bunq api for one api context (user) without the
+process global `BunqContext`, so many users can be fetched in one event loop:
+
+    async with AsyncClient(api_context) as client:
+        async for payment in aiter_all_payments(client, account_id):
+            ...
+
+Requests are signed and responses validated like by the sdk, the payments are
+the sdk objects and the dataframes equal the ones of `export`.
+"""
+
+import asyncio
+import logging
+import sys
+import types
+
+import aiohttp
+import bunq
+from bunq.sdk.context.api_context import ApiContext
+from bunq.sdk.exception.exception_factory import ExceptionFactory
+from bunq.sdk.http import api_client
+from bunq.sdk.http.bunq_response_raw import BunqResponseRaw
+from bunq.sdk.json import converter
+from bunq.sdk.model import generated
+from bunq.sdk.security import security
+from requests.structures import CaseInsensitiveDict
+
+from . import export
+from .metrics import registry
+from .ratelimit import RateLimiter
+
+# pylint: disable=protected-access
+
+__all__ = [
+    "AsyncClient",
+    "aiter_pages",
+    "aiter_all_payments",
+    "list_accounts",
+    "fetch_account",
+    "payments_as_dataframe",
+]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class AsyncClient:
+    """
+    asyncio client of the bunq api for one `ApiContext`
+
+    At most 'limit' requests are in flight, requests are scheduled within the
+    rate limits by 'rate_limiter' (default: bunq limits, one per client since
+    bunq limits per user). Use as async context manager, entering it ensures
+    an active session; a session about to expire is reset before the next
+    request, so the client may be kept open by long running services. The
+    caller saves the reset session (`api_context.save`), if wanted.
+    """
+
+    def __init__(self, api_context, limit=100, rate_limiter=None):
+        self.api_context = api_context
+        self.limit = limit
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(
+                connection_errors=(aiohttp.ClientConnectionError, asyncio.TimeoutError)
+            )
+        self.rate_limiter = rate_limiter
+        self._sdk_client = api_client.ApiClient(api_context)
+        self._session = None
+        self._session_lock = None
+
+    async def _ensure_session_active(self):
+        """Reset the session of the api context if it is about to expire"""
+        if self.api_context.is_session_active():
+            return
+        async with self._session_lock:
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(None, self.api_context.ensure_session_active):
+                _log.info(
+                    "Reset session, expires %s",
+                    self.api_context.session_context.expiry_time,
+                )
+
+    async def __aenter__(self):
+        self._session_lock = asyncio.Lock()
+        await self._ensure_session_active()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.limit)
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    @property
+    def user_id(self):
+        """id of the user of the api context"""
+        return self.api_context.session_context.user_id
+
+    async def _get(self, uri_relative, params):
+        """GET 'uri_relative' signed like the sdk, return the validated raw"""
+        await self._ensure_session_active()
+        # the signature and default headers of the sdk, aiohttp needs str values
+        headers = {
+            name: value.decode() if isinstance(value, bytes) else value
+            for name, value in self._sdk_client._get_all_headers(
+                api_client.ApiClient.BYTES_EMPTY, {}
+            ).items()
+        }
+        async with self._session.get(
+            self.api_context.environment_type.uri_base + uri_relative,
+            params=params,
+            headers=headers,
+            proxy=self.api_context.proxy_url,
+        ) as response:
+            status = response.status
+            body = await response.read()
+            headers = CaseInsensitiveDict(response.headers)
+        if status != api_client.ApiClient.STATUS_CODE_OK:
+            response = types.SimpleNamespace(content=body, headers=headers)
+            raise ExceptionFactory.create_exception_for_response(
+                status,
+                self._sdk_client._fetch_all_error_message(response),
+                self._sdk_client._fetch_response_id(response),
+            )
+        if self.api_context.installation_context is not None:
+            security.validate_response(
+                self.api_context.installation_context.public_key_server,
+                status,
+                body,
+                headers,
+            )
+        return BunqResponseRaw(body, headers)
+
+    async def _list(self, endpoint, uri_relative, params):
+        response_raw = await self._get(uri_relative, params)
+        return endpoint._from_json_list(response_raw, endpoint._OBJECT_TYPE_GET)
+
+    async def list(self, endpoint, params, *ids):
+        """List objects of the sdk 'endpoint' class, like `endpoint.list`.
+
+        'ids' are the ids in the listing url after the user id, e.g. the
+        monetary account id of payments. Returns the sdk `BunqResponse`."""
+        uri_relative = endpoint._ENDPOINT_URL_LISTING.format(self.user_id, *ids)
+        with registry.timer("api_request_seconds", endpoint=endpoint.__name__):
+            return await self.rate_limiter.acall(
+                endpoint.__name__, self._list, endpoint, uri_relative, params
+            )
+
+
+async def aiter_pages(  # pylint: disable=too-many-arguments
+    client,
+    account_id,
+    count=200,
+    present_ids=None,
+    since_id=None,
+    since=None,
+    until=None,
+):
+    """Iterate over the pages of payments of 'account_id', newest first.
+
+    The bounds are the ones of `export._iter_pages`."""
+    present_ids = present_ids or set()
+    since, until = export._timestamp(since), export._timestamp(until)
+    pagination = bunq.Pagination()
+    pagination.count = count
+    params = pagination.url_params_count_only
+    while True:
+        result = await client.list(generated.endpoint.Payment, params, account_id)
+        _log.info(
+            "found %d while fetching last %d Payments for account %s",
+            len(result.value),
+            count,
+            account_id,
+        )
+        registry.count("payments_fetched_total", len(result.value))
+        if not result.value:
+            return
+        page, last = export._cut_page(result.value, present_ids, since_id, since, until)
+        yield page
+        if last or not result.pagination.has_previous_page():
+            return
+        params = result.pagination.url_params_previous_page
+
+
+async def aiter_all_payments(  # pylint: disable=too-many-arguments
+    client,
+    account_id,
+    count=200,
+    present_ids=None,
+    since_id=None,
+    since=None,
+    until=None,
+):
+    """Iterate over all payments of 'account_id' with steps of 'count'.
+
+    The bounds are the ones of `export._iter_pages`."""
+    async for page in aiter_pages(
+        client, account_id, count, present_ids, since_id, since, until
+    ):
+        for payment in page:
+            yield payment
+
+
+async def _list_all(client, endpoint, count=200):
+    """List all objects of a listing 'endpoint', following all pages"""
+    pagination = bunq.Pagination()
+    pagination.count = count
+    params = pagination.url_params_count_only
+    result = []
+    while True:
+        response = await client.list(endpoint, params)
+        result.extend(response.value)
+        if not response.value or not response.pagination.has_previous_page():
+            return result
+        params = response.pagination.url_params_previous_page
+
+
+async def list_accounts(client):
+    """Return the `export.Accounts` of the user, listing all types at once"""
+    all_accounts = await asyncio.gather(
+        *(_list_all(client, endpoint) for endpoint in export._account_endpoints())
+    )
+    return export.Accounts(
+        balances=export._balances(
+            account for accounts in all_accounts for account in accounts
+        )
+    )
+
+
+async def fetch_account(  # pylint: disable=too-many-arguments
+    client, account_id, count, present_ids=None, since=None, until=None
+):
+    """Fetch 'count' payments from 'account_id' as `export.Payments`"""
+    payments = []
+    pages = aiter_pages(client, account_id, 200, present_ids, since=since, until=until)
+    try:
+        async for page in pages:
+            payments.extend(page[: count - len(payments)])
+            if len(payments) >= count:
+                break
+    finally:
+        await pages.aclose()
+    return export.Payments.from_records(
+        converter.serialize(p) for p in reversed(payments)
+    )
+
+
+def _restore_context(conf):
+    api_context = ApiContext.restore(conf)
+    return api_context, api_context.token
+
+
+async def payments_as_dataframe(  # pylint: disable=too-many-arguments
+    conf="bunq-sandbox.conf",
+    payments_per_account=None,
+    df_old=None,
+    since=None,
+    until=None,
+    limit=100,
+):
+    """Fetch payments from all accounts as pandas.DataFrame.
+
+    Like `export.payments_as_dataframe`, but all accounts are fetched at once
+    with at most 'limit' requests in flight. 'conf' is the path of an api
+    config file or an `ApiContext`."""
+    loop = asyncio.get_running_loop()
+    if isinstance(conf, ApiContext):
+        api_context, token = conf, conf.token
+    else:
+        api_context, token = await loop.run_in_executor(None, _restore_context, conf)
+    if payments_per_account is None:
+        payments_per_account = sys.maxsize
+    present_ids = export._present_ids(df_old)
+    async with AsyncClient(api_context, limit) as client:
+        accounts = await list_accounts(client)
+        account_ids = [account_id for account_id, _ in accounts.ids()]
+        frames = await asyncio.gather(
+            *(
+                fetch_account(
+                    client,
+                    account_id,
+                    payments_per_account,
+                    present_ids.get(account_id),
+                    since,
+                    until,
+                )
+                for account_id in account_ids
+            )
+        )
+    if not isinstance(conf, ApiContext) and api_context.token != token:
+        await loop.run_in_executor(None, api_context.save, conf)
+    frames = dict(zip(account_ids, (payments.payments for payments in frames)))
+    return export._combine(accounts, frames.__getitem__, 1, df_old)
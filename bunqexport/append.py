@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Append new payments to existing csv and json exports.
+
+The exports are written oldest first, so the newest exported payment is the
+last one of a file and only the tail of the file needs to be read to find it.
+Newer payments are appended to the files: csv rows in the columns of the
+existing header, json objects into the array before its closing bracket or as
+lines of a JSON Lines export.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+
+from . import export
+
+__all__ = ["APPENDABLE", "newest_id", "newest_ids", "append", "add_new"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# pylint: disable=protected-access
+
+# formats which can be appended to
+APPENDABLE = ("csv", "json")
+
+# bytes read from the end of a file at first, doubled until a payment is found
+_TAIL = 16384
+
+
+def _tail(fobj, size):
+    """Return the last 'size' bytes of the binary 'fobj' as text and whether
+    they are the whole file"""
+    end = fobj.seek(0, os.SEEK_END)
+    fobj.seek(max(0, end - size))
+    # the first character may be cut, it is never part of the last payment
+    return fobj.read().decode("utf-8", errors="ignore"), size >= end
+
+
+def _is_json_lines(path):
+    with open(path, "rb") as fobj:
+        return fobj.read(64).lstrip()[:1] != b"["
+
+
+def _last_json_record(text, json_lines):
+    """Return the last complete payment of a json export's tail 'text'"""
+    text = text.rstrip()
+    if json_lines:
+        # the first line of a tail may be cut
+        lines = text.splitlines()[1:]
+        return json.loads(lines[-1]) if lines else None
+    if not text.endswith("]"):
+        raise ValueError("not a json array")
+    end = len(text) - 1
+    decoder = json.JSONDecoder()
+    start = text.rfind("{", 0, end)
+    # from the right: objects of lists in the payment end before its end
+    while start >= 0:
+        try:
+            record, stop = decoder.raw_decode(text, start)
+        except ValueError:
+            record, stop = None, -1
+        if stop == end and isinstance(record, dict) and "id" in record:
+            return record
+        start = text.rfind("{", 0, start)
+    return None
+
+
+def _last_csv_row(text, header):
+    """Return the last complete row of a csv export's tail 'text'"""
+    rows = [row for row in csv.reader(io.StringIO(text)) if len(row) == len(header)]
+    return dict(zip(header, rows[-1])) if rows else None
+
+
+def newest_id(path):
+    """Return the id of the last payment in the csv or json export 'path',
+    None if there is none, reading only the end of the file"""
+    if not os.path.exists(path):
+        return None
+    is_csv = path.endswith(".csv")
+    if is_csv:
+        with open(path, newline="", encoding="utf-8") as fobj:
+            header = next(csv.reader(fobj), [])
+        if "id" not in header:
+            return None
+    else:
+        json_lines = _is_json_lines(path)
+    size = _TAIL
+    with open(path, "rb") as fobj:
+        while True:
+            text, whole = _tail(fobj, size)
+            if is_csv:
+                # the first row of a tail may be cut, the first of a file is
+                # the header
+                record = _last_csv_row(text.partition("\n")[2], header)
+            else:
+                record = _last_json_record(("\n" if whole else "") + text, json_lines)
+            if record is not None or whole:
+                break
+            size *= 2
+    if record is None or record.get("id") in (None, ""):
+        return None
+    return int(record["id"])
+
+
+def newest_ids(fname, formats):
+    """Return {path: id of the last payment} of the exports of 'fname' in
+    'formats', None if one of them can not be appended to"""
+    ids = {}
+    for fmt in formats:
+        path = f"{fname}.{fmt}"
+        try:
+            ids[path] = newest_id(path) if fmt in APPENDABLE else None
+        except ValueError as error:
+            _log.warning("Can not append to %s: %s", path, error)
+            return None
+        if ids[path] is None:
+            return None
+    return ids
+
+
+def _append_csv(path, payments, mode):
+    with open(path, newline="", encoding="utf-8") as fobj:
+        header = next(csv.reader(fobj))
+    frame = payments.payments
+    # the columns of a lexware profile do not depend on the payments
+    if isinstance(mode, (str, type(None))):
+        dropped = [col for col in frame.columns if col not in header]
+        if dropped:
+            _log.warning("Columns %s are not in %s, not appended", dropped, path)
+        frame = frame.reindex(columns=header)
+    with open(path, "a", newline="", encoding="utf-8") as fobj:
+        export.Payments(frame).to_csv(fobj, mode, header=False)
+
+
+def _append_json(path, payments):
+    json_lines = _is_json_lines(path)
+    chunk = io.StringIO()
+    payments.to_json(chunk, json_lines)
+    with open(path, "rb+") as fobj:
+        end = fobj.seek(0, os.SEEK_END)
+        fobj.seek(max(0, end - 64))
+        tail = fobj.read()
+        content = tail.rstrip()
+        if json_lines:
+            # a new line for the first appended payment
+            fobj.write(b"\n" if tail and not tail.endswith(b"\n") else b"")
+            fobj.write(chunk.getvalue().encode())
+            return
+        if not content.endswith(b"]"):
+            raise ValueError(f"{path} is not a json array")
+        empty = content[:-1].rstrip().endswith(b"[")
+        # overwrite the closing bracket of the array
+        fobj.seek(end - len(tail) + len(content) - 1)
+        fobj.truncate()
+        records = chunk.getvalue().strip()[1:-1]
+        fobj.write((("" if empty else ",") + records + "]").encode())
+
+
+def append(path, payments, mode):
+    """Append the `Payments` 'payments' (oldest first) to the existing csv or
+    json export 'path'"""
+    if path.endswith(".csv"):
+        _append_csv(path, payments, mode)
+    else:
+        _append_json(path, payments)
+    _log.info("Appended %d payments to %s", len(payments), path)
+
+
+def add_new(payments, mode, ids):
+    """Append the payments of 'payments' newer than the last one of each
+    export in 'ids' (see `newest_ids`) to it"""
+    frame = payments.payments
+    if frame.empty:
+        return
+    frame = frame.sort_values("id", kind="stable")
+    for path, last_id in ids.items():
+        new = frame[frame["id"] > last_id]
+        if len(new):
+            append(path, export.Payments(new), mode)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Export the payments of many bunq confs (users, companies) at once.
+
+The sdk keeps the api context in a process global `BunqContext`, so every conf
+is exported in a fresh worker process. All options of `bunqexport` apply to
+each conf, e.g.:
+
+    bunqexport-batch confs/ --workers 4 --store payments.db --mode lexware
+
+Files given by the options (exports, stores, caches, ...) get the name of the
+conf appended, e.g. payments_a.db for confs/a.conf, so the workers never
+share a file. `--watch` is not supported.
+"""
+
+import copy
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+from . import export
+from .metrics import registry
+
+__all__ = ["Result", "find_confs", "run_batch", "main"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+Result = namedtuple("Result", ("conf", "rows", "seconds", "error"))
+
+
+def find_confs(paths):
+    """Return the conf files in 'paths', directories are searched for *.conf"""
+    confs = []
+    for path in paths:
+        if os.path.isdir(path):
+            confs.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(".conf")
+            )
+        else:
+            confs.append(path)
+    return confs
+
+
+def _conf_names(confs):
+    """Return a distinct name per conf in 'confs' for its files.
+
+    The name of the conf file, prefixed by its directory if another conf has
+    the same name (confs/acme/bunq.conf: acme_bunq) and numbered if that is
+    not distinct either."""
+    names = [os.path.splitext(os.path.basename(conf))[0] for conf in confs]
+    names = [
+        "%s_%s" % (os.path.basename(os.path.dirname(os.path.abspath(conf))), name)
+        if names.count(name) > 1
+        else name
+        for conf, name in zip(confs, names)
+    ]
+    numbers = {}
+    distinct = []
+    for name in names:
+        if names.count(name) > 1:
+            numbers[name] = numbers.get(name, 0) + 1
+            name = "%s_%d" % (name, numbers[name])
+        distinct.append(name)
+    return distinct
+
+
+def _per_conf(path, name):
+    """Return 'path' with the 'name' of a conf appended, before the extension"""
+    if path is None:
+        return None
+    root, ext = os.path.splitext(path)
+    return "%s_%s%s" % (root, name, ext)
+
+
+def _export_conf(args):
+    """Export one conf in a worker process, return its `Result`
+
+    The metrics of the worker are written to its metrics file, also if the
+    export failed."""
+    export._setup_logging(args.verbose)  # pylint: disable=protected-access
+    start = time.perf_counter()
+    try:
+        rows = export._run(args, output=False)  # pylint: disable=protected-access
+    except Exception as error:  # pylint: disable=broad-except
+        _log.exception("Export of %s failed", args.conf)
+        return Result(args.conf, None, time.perf_counter() - start, repr(error))
+    finally:
+        if args.metrics_file:
+            registry.write(args.metrics_file)
+    return Result(args.conf, rows, time.perf_counter() - start, None)
+
+
+# options naming files written by an export, see `_conf_args`
+_FILE_OPTIONS = (
+    "outfile",
+    "accounts_cache",
+    "metrics_file",
+    "checkpoint",
+    "store",
+    "aggregates",
+)
+
+
+def _conf_args(conf, args, name):
+    """Return a copy of 'args' for 'conf', its files named after 'name'"""
+    conf_arg = copy.copy(args)
+    conf_arg.conf = conf
+    for option in _FILE_OPTIONS:
+        setattr(conf_arg, option, _per_conf(getattr(args, option), name))
+    return conf_arg
+
+
+def run_batch(confs, args, workers=4):
+    """Export every conf in 'confs' with the parsed `bunqexport` 'args'.
+
+    At most 'workers' confs are exported at the same time, each in its own
+    process. Output files, the accounts cache, the metrics file, the
+    checkpoint, the store and the aggregates get the name of the conf
+    appended (see `_conf_names`). Returns a `Result` per conf in the order of
+    'confs'."""
+    conf_args = [
+        _conf_args(conf, args, name) for conf, name in zip(confs, _conf_names(confs))
+    ]
+    with multiprocessing.Pool(workers, maxtasksperchild=1) as pool:
+        return pool.map(_export_conf, conf_args, chunksize=1)
+
+
+def _summary(results):
+    lines = [f"{'conf':30} {'status':8} {'rows':>8} {'seconds':>8}"]
+    for result in results:
+        lines.append(
+            f"{result.conf:30} {'failed' if result.error else 'ok':8}"
+            f" {'-' if result.rows is None else result.rows:>8}"
+            f" {result.seconds:8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """batch entrypoint, exits with 1 if the export of any conf failed"""
+    parser = export._parser()  # pylint: disable=protected-access
+    parser.prog = "bunqexport-batch"
+    parser.add_argument(
+        "confs", nargs="+", help="conf files or directories with *.conf files"
+    )
+    parser.add_argument(
+        "--workers",
+        default=4,
+        type=int,
+        help="Number of confs to export in parallel (default 4)",
+    )
+    args = export._parse_args(parser)  # pylint: disable=protected-access
+    if args.watch is not None:
+        parser.error("--watch can not be used with bunqexport-batch")
+    export._setup_logging(args.verbose)  # pylint: disable=protected-access
+    confs = find_confs(args.confs)
+    if not confs:
+        parser.error("no conf files found")
+    results = run_batch(confs, args, args.workers)
+    print(_summary(results))
+    sys.exit(1 if any(result.error for result in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Checkpoints of long downloads, to resume them after a failure.
+
+While fetching, every completed page of payments is saved together with the
+pagination cursor (the url params of the next, older page) of its account.
+A resumed download starts with the saved payments and continues at the saved
+cursor instead of the newest page; accounts downloaded completely are not
+fetched again.
+"""
+
+import json
+import sqlite3
+import threading
+
+__all__ = ["Checkpoint"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    monetary_account_id INTEGER PRIMARY KEY,
+    options TEXT NOT NULL,
+    params TEXT,
+    done INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    monetary_account_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    payment TEXT NOT NULL,
+    PRIMARY KEY (monetary_account_id, position)
+);
+"""
+
+
+class Checkpoint:
+    """
+    sqlite database with the payments fetched so far and a cursor per account
+
+    the cursor is only valid for the same download 'options' (count, dates),
+    may be shared by the threads fetching accounts in parallel
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database"""
+        self._db.close()
+
+    def load(self, account_id, options):
+        """Return the saved (records, params, done) of 'account_id'.
+
+        'records' are the fetched payments newest first, 'params' the url
+        params of the next page (None to start at the newest page). A download
+        of 'account_id' with other 'options' is discarded."""
+        options = json.dumps(options, sort_keys=True)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT options, params, done FROM cursors"
+                " WHERE monetary_account_id = ?",
+                (account_id,),
+            ).fetchone()
+            if row is None or row[0] != options:
+                with self._db:
+                    self._reset(account_id, options)
+                return [], None, False
+            rows = self._db.execute(
+                "SELECT payment FROM pages WHERE monetary_account_id = ?"
+                " ORDER BY position",
+                (account_id,),
+            ).fetchall()
+        params = None if row[1] is None else json.loads(row[1])
+        return [json.loads(r[0]) for r in rows], params, bool(row[2])
+
+    def _reset(self, account_id, options):
+        self._db.execute(
+            "DELETE FROM pages WHERE monetary_account_id = ?", (account_id,)
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO cursors VALUES (?, ?, NULL, 0)",
+            (account_id, options),
+        )
+
+    def add_page(self, account_id, records, params):
+        """Save a fetched page of serialized payments (newest first) and the
+        url 'params' of the next page, None if it was the last one"""
+        with self._lock, self._db:
+            start = self._db.execute(
+                "SELECT count(*) FROM pages WHERE monetary_account_id = ?",
+                (account_id,),
+            ).fetchone()[0]
+            self._db.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?)",
+                [
+                    (account_id, start + index, json.dumps(record))
+                    for index, record in enumerate(records)
+                ],
+            )
+            self._db.execute(
+                "UPDATE cursors SET params = ?, done = ? WHERE monetary_account_id = ?",
+                (
+                    None if params is None else json.dumps(params),
+                    int(params is None),
+                    account_id,
+                ),
+            )
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Pooled keep-alive connections for the bunq sdk.
+
+The sdk sends every request with `requests.request`, which opens (and pays
+the TLS handshake for) a new connection each time. `use_connection_pool`
+routes all requests of the sdk through one `requests.Session` instead.
+"""
+
+import requests
+import requests.adapters
+from bunq.sdk.http import api_client
+
+__all__ = ["use_connection_pool"]
+
+
+class _PooledRequests:  # pylint: disable=too-few-public-methods
+    """
+    stands in for the `requests` module in the api client of the sdk
+    """
+
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session"""
+        return self.session.request(method, url, **kwargs)
+
+
+def use_connection_pool(pool_size=10):
+    """Send all sdk requests through a keep-alive session.
+
+    'pool_size' is the number of connections kept per host, it should not be
+    lower than the number of threads doing requests."""
+    current = api_client.requests
+    if isinstance(current, _PooledRequests):
+        if current.pool_size >= pool_size:
+            return current.session
+        current.session.close()
+    api_client.requests = _PooledRequests(pool_size)
+    return api_client.requests.session
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Console output of payments.
+
+`table` shows the oldest and newest payments of an account up to a number of
+rows and counts the others, only the shown rows are formatted. `summary` only
+gives the number of payments, their period and the sums per currency.
+"""
+
+import decimal
+
+from . import export
+
+__all__ = ["COLUMNS", "MAX_ROWS", "table", "summary", "report"]
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+# columns shown in tables
+COLUMNS = (
+    "created",
+    "type",
+    "counterparty_alias.name",
+    "amount.currency",
+    "amount.value",
+    "description",
+)
+
+# rows of a table by default, the oldest half and the newest half
+MAX_ROWS = 20
+
+
+def _format(column, values):
+    """Return the 'values' of 'column' as strings for a table"""
+    if column == "created":
+        return export._by_value(
+            values.dt.normalize(), lambda dates: dates.dt.strftime("%d.%m.%Y")
+        )
+    if column == "description":
+        return values.fillna("").str.replace("\n", " ", regex=False).str.strip()
+    return values.fillna("").astype(str)
+
+
+def table(frame, max_rows=MAX_ROWS):
+    """Return the flattened payments 'frame' as table with at most
+    'max_rows' (None for all) of its first and last payments"""
+    import pandas
+
+    if frame.empty:
+        return "0 payments"
+    columns = [col for col in COLUMNS if col in frame]
+    hidden = 0 if max_rows is None else max(len(frame) - max_rows, 0)
+    head = len(frame) - hidden - max_rows // 2 if hidden else len(frame)
+    if hidden:
+        frame = pandas.concat([frame.iloc[:head], frame.iloc[head + hidden :]])
+    shown = pandas.DataFrame(
+        {col: _format(col, frame[col]) for col in columns}, columns=columns
+    )
+    if hidden:
+        gap = pandas.DataFrame([["..."] * len(columns)], columns=columns)
+        shown = pandas.concat([shown.iloc[:head], gap, shown.iloc[head:]])
+    text = shown.to_string(index=False, justify="left")
+    if hidden:
+        text += f"\n{len(frame) + hidden} payments, {hidden} not shown"
+    return text
+
+
+def _amount(cents):
+    return f"{decimal.Decimal(int(cents)).scaleb(-2):.2f}"
+
+
+def summary(frame):
+    """Return the number, period and sums per currency of the flattened
+    payments 'frame' as text"""
+    import pandas
+
+    if frame.empty:
+        return "0 payments"
+    first, last = frame["created"].min(), frame["created"].max()
+    lines = [
+        f"{len(frame)} payments from {first:%d.%m.%Y} to {last:%d.%m.%Y}",
+    ]
+    cents = export._cents(frame["amount.value"])
+    sums = pandas.DataFrame(
+        {
+            "currency": frame["amount.currency"].to_numpy(),
+            "incoming": cents.clip(lower=0).to_numpy(),
+            "outgoing": cents.clip(upper=0).to_numpy(),
+        }
+    )
+    for currency, row in sums.groupby("currency").sum().iterrows():
+        lines.append(
+            f"  {currency} in {_amount(row.incoming)}"
+            f" out {_amount(row.outgoing)}"
+            f" net {_amount(row.incoming + row.outgoing)}"
+        )
+    return "\n".join(lines)
+
+
+def report(account_name, payments, max_rows=MAX_ROWS, summary_only=False):
+    """Return the console output of the `Payments` of an account: its
+    `summary` or a `table` (see there)"""
+    if summary_only:
+        return f"{account_name}: {summary(payments.payments)}"
+    return table(payments.payments, max_rows)
@@ -21,51 +21,123 @@ every active account.
   'Datei / Export/Import / Datenimport... / Umsätze', or even better with the
   Vorlagen.dat (FM does not support isodates)
 
+pandas and the bunq sdk take most of the start up time, so they are imported
+by the functions which need them: `--help` and the offline commands (see
+`offline`) never load the sdk.
 """
 
 import argparse
+import concurrent.futures
+import datetime
+import decimal
+import importlib.util
+import io
 import json
 import logging
+import os
+import queue
 import sys
-from typing import Optional
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
 
-import bunq
-import bunq.sdk.context.api_context
-import bunq.sdk.context.bunq_context
-import pandas
-from bunq.sdk.model import generated
+from .checkpoint import Checkpoint
+from .metrics import registry
+from .ratelimit import RateLimiter
+from .store import PaymentStore
+
+if TYPE_CHECKING:
+    import pandas
+
+# pylint: disable=import-outside-toplevel,too-many-lines
 
 __all__ = ["main", "payments_as_dataframe"]
 
 _log = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# export formats, csv and json by default
+_FORMATS = ("csv", "json", "parquet", "feather")
+
+_AMOUNT_COLUMNS = ("amount.value", "balance_after_mutation.value")
+
+# string columns with at most this share of distinct values become categoricals
+_CATEGORY_RATIO = 0.5
+
+# all api calls go through it to stay within the rate limits of bunq
+_rate_limiter = RateLimiter()  # pylint: disable=invalid-name
+
+
+@registry.timed("stage_seconds", stage="setup_context")
+def _setup_context(conf, pool_size=10):
+    """setup the context (login, etc) to work with bunq api
+
+    A stored session which is still valid is reused, only otherwise a new one
+    is created and saved to 'conf'. All requests go through a pool of
+    'pool_size' keep-alive connections. Returns the session token."""
+    from bunq.sdk.context.api_context import ApiContext
+    from bunq.sdk.context.bunq_context import BunqContext
+
+    from .connection import use_connection_pool
 
-def _setup_context(conf):
-    """setup the context (login, etc) to work with bunq api"""
     _log.info("Using conf: %s", conf)
-    api_context = bunq.sdk.context.api_context.ApiContext.restore(conf)
-    api_context.ensure_session_active()
-    api_context.save(conf)
-    bunq.sdk.context.bunq_context.BunqContext.load_api_context(api_context)
+    use_connection_pool(pool_size)
+    start = time.perf_counter()
+    api_context = ApiContext.restore(conf)
+    if api_context.ensure_session_active():
+        api_context.save(conf)
+        _log.info("Created new session in %.3fs", time.perf_counter() - start)
+    else:
+        _log.info("Reused session in %.3fs", time.perf_counter() - start)
+    start = time.perf_counter()
+    BunqContext.load_api_context(api_context)
+    _log.debug("Loaded user context in %.3fs", time.perf_counter() - start)
+    return api_context.token
 
 
-def _iter_all_payments(account_id, count=200, present_ids=None):
-    """Iterate over all payments of 'account_id' with steps of 'count'."""
-    result = None
-    present_ids = present_ids or set()
-    should_stop = False
-    while (result is None or result.value) and not should_stop:
-        if result is None:
-            pagination = bunq.Pagination()
-            pagination.count = count  # maximum number
-            params = pagination.url_params_count_only
-        elif result.pagination.has_previous_page():
-            params = result.pagination.url_params_previous_page
-        else:
-            break
+def _save_context(conf, token):
+    """Save the api context to 'conf' if the session changed since 'token'"""
+    from bunq.sdk.context.bunq_context import BunqContext
+
+    api_context = BunqContext.api_context()
+    if api_context.token != token:
+        api_context.save(conf)
+
+
+def _api_call(endpoint, func, *args, **kwargs):
+    """Call the api within the rate limits, recording the seconds per endpoint"""
+    with registry.timer("api_request_seconds", endpoint=endpoint):
+        return _rate_limiter.call(endpoint, func, *args, **kwargs)
+
+
+def _timestamp(value):
+    """Return a date/datetime (or string of it) formatted like Payment.created"""
+    import pandas
 
-        result = generated.endpoint.Payment.list(
-            params=params, monetary_account_id=account_id
+    if value is None:
+        return None
+    return pandas.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _iter_cursor_pages(account_id, count=200, params=None):
+    """Iterate over the pages of payments of 'account_id', newest first.
+
+    Starts at the page of the url 'params' (default: the newest page) and
+    yields the payments of every page with the params of the next, older page
+    (None after the last one), the cursor to continue at."""
+    import bunq
+    from bunq.sdk.model import generated
+
+    if params is None:
+        pagination = bunq.Pagination()
+        pagination.count = count  # maximum number
+        params = pagination.url_params_count_only
+    while params is not None:
+        result = _api_call(
+            "Payment",
+            generated.endpoint.Payment.list,
+            params=params,
+            monetary_account_id=account_id,
         )
         _log.info(
             "found %d while fetching last %d Payments for account %s",
@@ -73,20 +145,157 @@ def _iter_all_payments(account_id, count=200, present_ids=None):
             count,
             account_id,
         )
+        registry.count("payments_fetched_total", len(result.value))
 
         if not result.value:
-            break
+            return
+        params = None
+        if result.pagination.has_previous_page():
+            params = result.pagination.url_params_previous_page
+        yield result.value, params
 
-        for payment in result.value:
-            if payment._id_ in present_ids:
-                should_stop = True
-                break
-            yield payment
 
+def _prefetch(iterable, size):
+    """Iterate over 'iterable' in a background thread, up to 'size' items ahead.
+
+    Overlaps the requests of the next pages with the processing of the current
+    one; 'size' 0 iterates in the calling thread. Errors of 'iterable' are
+    raised here. If iterating stops early, the thread stops after the item it
+    is getting, so a few pages may have been fetched in vain."""
+    if size <= 0:
+        yield from iterable
+        return
+    items = queue.Queue(size)
+    stopped = threading.Event()
+    end = object()
 
-def _get_all_payments(count, account_id=None, present_ids=None):
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as error:  # pylint: disable=broad-except
+            put((end, error))
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            with registry.timer("prefetch_wait_seconds"):
+                item, error = items.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _iter_pages(  # pylint: disable=too-many-arguments
+    account_id,
+    count=200,
+    present_ids=None,
+    since_id=None,
+    since=None,
+    until=None,
+    prefetch=0,
+):
+    """Iterate over the pages of payments of 'account_id', newest first.
+
+    Stops at the first payment in 'present_ids', not newer than 'since_id' or
+    created before 'since', the last page is truncated there (but keeps known
+    payments updated since, see `_cut_page`). Payments created at or after
+    'until' are skipped.
+
+    With 'prefetch' > 0 up to that many pages are requested in the background,
+    while the caller processes the current page."""
+    present_ids = present_ids or set()
+    since, until = _timestamp(since), _timestamp(until)
+    pages = _prefetch(_iter_cursor_pages(account_id, count), prefetch)
+    try:
+        for page, _ in pages:
+            page, last = _cut_page(page, present_ids, since_id, since, until)
+            yield page
+            if last:
+                return
+    finally:
+        pages.close()
+
+
+def _cut_page(page, present_ids, since_id, since, until):
+    """Return the payments of 'page' within the bounds and if it is the last.
+
+    'since' and 'until' are formatted by `_timestamp`, see `_iter_pages`. If
+    'present_ids' maps the ids to the 'updated' of the known payments (see
+    `_present_ids`), the known payments of the page with the first of them
+    are returned as well when they were updated since."""
+    if until is not None:
+        page = [payment for payment in page if payment.created < until]
+    for index, payment in enumerate(page):
+        if payment._id_ in present_ids:
+            updated = _updated(page[index:], present_ids, since_id, since)
+            return page[:index] + updated, True
+        if _is_older(payment, since_id, since):
+            return page[:index], True
+    return page, False
+
+
+def _is_older(payment, since_id, since):
+    return (since_id is not None and payment._id_ <= since_id) or (
+        since is not None and payment.created < since
+    )
+
+
+def _updated(page, present_ids, since_id, since):
+    """Return the payments of 'page' in 'present_ids' with another 'updated'"""
+    if not isinstance(present_ids, dict):
+        return []
+    return [
+        payment
+        for payment in page
+        if payment._id_ in present_ids
+        and present_ids[payment._id_] != _nanoseconds(payment.updated)
+        and not _is_older(payment, since_id, since)
+    ]
+
+
+def _nanoseconds(value):
+    """Return the timestamp string 'value' in nanoseconds since the epoch"""
+    import pandas
+
+    return pandas.Timestamp(value).value
+
+
+def _iter_all_payments(  # pylint: disable=too-many-arguments
+    account_id, count=200, present_ids=None, since_id=None, since=None, until=None
+):
+    """Iterate over all payments of 'account_id' with steps of 'count'.
+
+    Stops at the first payment in 'present_ids', not newer than 'since_id' or
+    created before 'since'. Payments created at or after 'until' are skipped."""
+    for page in _iter_pages(account_id, count, present_ids, since_id, since, until):
+        yield from page
+
+
+def _get_all_payments(  # pylint: disable=too-many-arguments
+    count, account_id=None, present_ids=None, since_id=None, since=None, until=None
+):
     """Fetch all Payments wie bunq api in bunq_sdk format"""
-    payments_gen = _iter_all_payments(account_id, 200, present_ids)
+    payments_gen = _iter_all_payments(
+        account_id, 200, present_ids, since_id, since, until
+    )
     result = []
     for _ in range(count):
         try:
@@ -96,104 +305,436 @@ def _get_all_payments(count, account_id=None, present_ids=None):
     return result
 
 
+def _fetch_records(  # pylint: disable=too-many-arguments
+    count,
+    account_id,
+    present_ids=None,
+    since_id=None,
+    since=None,
+    until=None,
+    prefetch=0,
+):
+    """Fetch 'count' serialized payments of 'account_id', newest first.
+
+    Every page is serialized while the next ones are prefetched, see
+    `_iter_pages` for the bounds."""
+    from bunq.sdk.json import converter
+
+    records = []
+    pages = _iter_pages(account_id, 200, present_ids, since_id, since, until, prefetch)
+    try:
+        for page in pages:
+            records.extend(converter.serialize(p) for p in page[: count - len(records)])
+            if len(records) >= count:
+                break
+    finally:
+        pages.close()
+    return records
+
+
+def _fetch_checkpointed(  # pylint: disable=too-many-arguments
+    checkpoint,
+    account_id,
+    count,
+    present_ids=None,
+    since=None,
+    until=None,
+    prefetch=0,
+):
+    """Fetch 'count' serialized payments of 'account_id' (newest first),
+    saving every page to the `Checkpoint` 'checkpoint'.
+
+    A download of the account saved with the same 'count' and dates is
+    continued after its last page, see `_iter_pages` for the bounds and
+    'prefetch'."""
+    from bunq.sdk.json import converter
+
+    present_ids = present_ids or set()
+    since, until = _timestamp(since), _timestamp(until)
+    records, params, done = checkpoint.load(
+        account_id, {"count": count, "since": since, "until": until}
+    )
+    if records or params is not None:
+        _log.info(
+            "resuming account %s after %d payments%s",
+            account_id,
+            len(records),
+            " (complete)" if done else "",
+        )
+    if done:
+        return records
+    pages = _prefetch(_iter_cursor_pages(account_id, 200, params), prefetch)
+    try:
+        for page, params in pages:
+            page, last = _cut_page(page, present_ids, None, since, until)
+            page = [converter.serialize(p) for p in page[: count - len(records)]]
+            records.extend(page)
+            if last or len(records) >= count:
+                params = None
+            checkpoint.add_page(account_id, page, params)
+            if params is None:
+                return records
+    finally:
+        pages.close()
+    checkpoint.add_page(account_id, [], None)
+    return records
+
+
+def _flat_items(record, prefix=""):
+    """Yield (column, value) of a nested dict in the order of json_normalize.
+
+    Keys are sorted like in `to_json` of the bunq sdk; on the top level, nested
+    dicts follow after all other values."""
+    nested = []
+    for key in sorted(record):
+        value = record[key]
+        if not isinstance(value, dict):
+            yield prefix + key, value
+        elif prefix:
+            yield from _flat_items(value, prefix + key + ".")
+        else:
+            nested.append(key)
+    for key in nested:
+        yield from _flat_items(record[key], key + ".")
+
+
+def _records_to_dataframe(records):
+    """Build a flattened DataFrame from serialized bunq objects.
+
+    Gives the same columns as `json_normalize` of their `to_json`, but fills
+    the columns in one pass without the json round trip."""
+    import pandas
+
+    columns = {}
+    rows = 0
+    for record in records:
+        for name, value in _flat_items(record):
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = [None] * rows
+            column.append(value)
+        rows += 1
+        for column in columns.values():
+            if len(column) < rows:
+                column.append(None)
+    return pandas.DataFrame(columns)
+
+
+def _cents(values):
+    """Return amounts with two decimal places as integer cents"""
+    import pandas
+
+    cents = (pandas.to_numeric(values) * 100).round()
+    return cents.astype("Int64" if cents.isna().any() else "int64")
+
+
+def _by_value(values, func):
+    """Return 'func' applied to the distinct 'values' for all of them, as
+    payments share few dates and amounts; missing values are empty"""
+    import numpy
+    import pandas
+
+    codes, uniques = pandas.factorize(values)
+    formatted = numpy.append(func(pandas.Series(uniques)).to_numpy(object), "")
+    return formatted[codes]
+
+
+def _is_empty_list(value):
+    return isinstance(value, list) and not value
+
+
+def _cents_column(name):
+    """Return the name of the cents column of the amount column 'name'"""
+    return name[: -len("value")] + "cents"
+
+
+def _amount_cents(frame, column):
+    """Return the amounts of 'column' (e.g. "amount.value") of 'frame' as
+    integer cents, also of a `_compact` frame"""
+    cents = _cents_column(column)
+    if cents in frame:
+        return frame[cents]
+    return _cents(frame[column])
+
+
+def _compact(frame):
+    """Return a memory efficient copy of the flattened payments 'frame'
+
+    Amounts become integer cents (e.g. 'amount.cents'), repeating strings
+    become categoricals and columns of empty lists (like 'attachment') are
+    dropped. Compact frames stay compact."""
+    import pandas
+
+    compact = {}
+    for name, column in frame.items():
+        if name in _AMOUNT_COLUMNS:
+            compact[_cents_column(name)] = _cents(column)
+        elif column.dtype != object:
+            compact[name] = column
+        elif column.map(_is_empty_list).all():
+            continue
+        else:
+            try:
+                distinct = column.nunique()
+            except TypeError:  # unhashable, e.g. non empty lists
+                distinct = len(column)
+            if distinct <= len(column) * _CATEGORY_RATIO:
+                column = column.astype("category")
+            compact[name] = column
+    return pandas.DataFrame(compact, index=frame.index)
+
+
 class Payments:
     """
     Abstraction over bunq payments using a pandas dataframe
 
-    payments are served in json
+    payments are served in json or as an already flattened dataframe
     """
 
     def __init__(self, payments):
-        self.payments = pandas.json_normalize(json.loads(payments))
+        import pandas
+
+        if isinstance(payments, str):
+            with registry.timer("stage_seconds", stage="normalize"):
+                payments = pandas.json_normalize(json.loads(payments))
+        self.payments = payments
         if self.payments.size > 0:
-            self.payments["created"] = pandas.to_datetime(self.payments["created"])
-            self.payments["updated"] = pandas.to_datetime(self.payments["updated"])
+            with registry.timer("stage_seconds", stage="parse_dates"):
+                self.payments["created"] = pandas.to_datetime(self.payments["created"])
+                self.payments["updated"] = pandas.to_datetime(self.payments["updated"])
             self.payments["description"] = self.payments["description"].str.replace(
                 r"\n", " "
             )
 
     def __repr__(self):
-        return self.payments.to_string(
-            columns=(
-                "created",
-                "type",
-                "counterparty_alias.name",
-                "amount.currency",
-                "amount.value",
-                "description",
-            ),
-            show_dimensions=False,
-            index=False,
-            justify="left",
-            formatters={
-                "created": lambda x: x.strftime("%d.%m.%Y"),
-                "description": lambda x: x.replace("\n", " ").strip(),
-            },
-        )
+        from . import console
+
+        return console.table(self.payments)
 
-    def to_csv(self, path_or_buf, mode=None):
-        """Create a csv export from bunq data"""
+    @registry.timed("stage_seconds", stage="to_csv")
+    def to_csv(self, path_or_buf, mode=None, header=True):
+        """Create a csv export from bunq data
+
+        'mode' is "raw", "lexware" (all columns, dates as DD.MM.YYYY) or a
+        `lexware.Profile` writing only the columns of an import profile"""
+        if not isinstance(mode, (str, type(None))):
+            mode.write(self.payments, path_or_buf, header)
+            return
         self.payments.to_csv(
             path_or_buf,
             date_format="%d.%m.%Y" if mode == "lexware" else None,
             index=False,
+            header=header,
             line_terminator="\n" if sys.platform == "win32" else "\r\n",
         )
 
-    def to_json(self, path_or_buf):
-        """Create a json export from flattened (depth=1) bunq data"""
-        self.payments.to_json(path_or_buf, orient="records", date_format="iso")
+    @registry.timed("stage_seconds", stage="to_json")
+    def to_json(self, path_or_buf, lines=False):
+        """Create a json export from flattened (depth=1) bunq data
+
+        With 'lines' one json object per line (JSON Lines) is written."""
+        self.payments.to_json(
+            path_or_buf, orient="records", date_format="iso", lines=lines
+        )
+
+    def typed(self):
+        """Return a copy of the payments with the amounts as decimals"""
+        typed = self.payments.reset_index(drop=True)
+        for col in _AMOUNT_COLUMNS:
+            if col in typed:
+                typed[col] = typed[col].map(decimal.Decimal, na_action="ignore")
+        return typed
+
+    @registry.timed("stage_seconds", stage="to_parquet")
+    def to_parquet(self, path):
+        """Create a parquet export with typed columns (requires pyarrow)"""
+        self.typed().to_parquet(path, index=False)
+
+    @registry.timed("stage_seconds", stage="to_feather")
+    def to_feather(self, path):
+        """Create a feather (arrow ipc) export with typed columns"""
+        self.typed().to_feather(path)
+
+    def compact(self):
+        """Return a memory efficient copy of the payments, see `_compact`"""
+        return _compact(self.payments)
 
     def __len__(self):
         return len(self.payments)
 
     @classmethod
-    def fetch_account(cls, account_id, count, present_ids=None):
-        """Fetch 'count' payments from 'account_id'."""
-        payments = _get_all_payments(count, account_id, present_ids)
-        payments_as_json = (p.to_json() for p in reversed(payments))
-        data = "[" + ",".join(payments_as_json) + "]"
-        return Payments(data)
+    def from_records(cls, records):
+        """Create from serialized payments (dicts like `Payment.to_json`)"""
+        with registry.timer("stage_seconds", stage="normalize"):
+            payments = _records_to_dataframe(records)
+        return cls(payments)
 
+    @classmethod
+    def fetch_account(  # pylint: disable=too-many-arguments
+        cls,
+        account_id,
+        count,
+        present_ids=None,
+        since_id=None,
+        since=None,
+        until=None,
+        checkpoint=None,
+        prefetch=0,
+    ):
+        """Fetch 'count' payments from 'account_id'.
 
-class Accounts:  # pylint: disable=too-few-public-methods
-    """
-    represent balances of of all active accounts
-    """
+        Only payments created from 'since' (inclusive) to 'until' (exclusive)
+        are fetched, if given. With a `Checkpoint` the fetched pages are saved
+        and an interrupted download is resumed (not with 'since_id').
 
-    def __init__(self):
-        pagination = bunq.Pagination()
-        pagination.count = 50
+        With 'prefetch' > 0 up to that many pages are requested in the
+        background while the current one is processed."""
+        if checkpoint is not None and since_id is None:
+            records = _fetch_checkpointed(
+                checkpoint, account_id, count, present_ids, since, until, prefetch
+            )
+        else:
+            records = _fetch_records(
+                count, account_id, present_ids, since_id, since, until, prefetch
+            )
+        return cls.from_records(reversed(records))
+
+    @classmethod
+    def sync_account(cls, store, account_id, count, balance=None):
+        """Fetch new payments of 'account_id' into 'store' and return all.
+
+        Without a watermark in the store (first sync) only the last 'count'
+        payments are fetched, afterwards all payments newer than it.
+
+        If the current 'balance' is given and equals the one of the last sync,
+        the account is skipped without any api call, so it must not be older
+        than the last sync (see `Accounts.listed_balance`). Payments which do not
+        change the balance in sum are then fetched with the next change."""
+        from bunq.sdk.json import converter
 
-        all_accounts = generated.endpoint.MonetaryAccountBank.list(
-            pagination.url_params_count_only
-        ).value
+        if balance is not None and store.balance(account_id) == balance:
+            _log.info("account %s unchanged (%s), skipped", account_id, balance)
+            return cls.from_records(store.records(account_id))
+        since_id = store.watermark(account_id)
+        if since_id is not None:
+            count = sys.maxsize
+        payments = _get_all_payments(count, account_id, since_id=since_id)
+        store.add(account_id, (converter.serialize(p) for p in reversed(payments)))
+        _log.info("stored %d new Payments for account %s", len(payments), account_id)
+        if balance is not None:
+            store.set_balance(account_id, balance)
+        return cls.from_records(store.records(account_id))
+
+
+def _list_all(endpoint, count=200):
+    """List all objects of a listing 'endpoint', following all pages"""
+    import bunq
+
+    pagination = bunq.Pagination()
+    pagination.count = count
+    params = pagination.url_params_count_only
+    result = []
+    while True:
+        response = _api_call(endpoint.__name__, endpoint.list, params)
+        result.extend(response.value)
+        if not response.value or not response.pagination.has_previous_page():
+            return result
+        params = response.pagination.url_params_previous_page
 
-        all_accounts.extend(
-            generated.endpoint.MonetaryAccountSavings.list(
-                pagination.url_params_count_only
-            ).value
+
+def _read_accounts_cache(path, max_age, user_id=None):
+    """Return the balances cached in 'path' if not older than 'max_age' seconds
+    and cached for 'user_id', None if missing or malformed"""
+    try:
+        with open(path, encoding="utf-8") as fobj:
+            cached = json.load(fobj)
+        if cached["user_id"] != user_id or time.time() - cached["time"] > max_age:
+            return None
+        balances = {balance[0]: tuple(balance[1:]) for balance in cached["balances"]}
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+    _log.info("Using cached accounts from %s", path)
+    return balances
+
+
+def _write_accounts_cache(path, balances, user_id=None):
+    """Cache the 'balances' of all accounts of 'user_id' in 'path'"""
+    with open(path, "w", encoding="utf-8") as fobj:
+        json.dump(
+            {
+                "time": time.time(),
+                "user_id": user_id,
+                "balances": [[id_, *val] for id_, val in balances.items()],
+            },
+            fobj,
         )
 
-        all_accounts.extend(
-            generated.endpoint.MonetaryAccountJoint.list(
-                pagination.url_params_count_only
-            ).value
+
+def _session_user_id():
+    """Return the id of the user of the loaded api context"""
+    from bunq.sdk.context.bunq_context import BunqContext
+
+    return BunqContext.api_context().session_context.user_id
+
+
+def _account_endpoints():
+    """Return the listing endpoints of all account types"""
+    from bunq.sdk.model import generated
+
+    return (
+        generated.endpoint.MonetaryAccountBank,
+        generated.endpoint.MonetaryAccountSavings,
+        generated.endpoint.MonetaryAccountJoint,
+    )
+
+
+def _balances(all_accounts):
+    """Return the balances of the active accounts of 'all_accounts' by id"""
+    return {
+        aacc.id_: (
+            aacc.description,
+            aacc.balance.currency,
+            aacc.balance.value,
+            aacc.description,
+        )
+        for aacc in (
+            monetary_account_bank
+            for monetary_account_bank in all_accounts
+            if monetary_account_bank.status == "ACTIVE"
         )
+    }
 
-        self.balances = {
-            aacc.id_: (
-                aacc.description,
-                aacc.balance.currency,
-                aacc.balance.value,
-                aacc.description,
-            )
-            for aacc in (
-                monetary_account_bank
-                for monetary_account_bank in all_accounts
-                if monetary_account_bank.status == "ACTIVE"
+
+class Accounts:  # pylint: disable=too-few-public-methods
+    """
+    represent balances of of all active accounts
+
+    the account types are listed in parallel, optionally the result is cached
+    in the file 'cache' for 'max_age' seconds (for the user of the session);
+    or pass known 'balances'
+    """
+
+    def __init__(self, cache=None, max_age=300, balances=None):
+        self.balances = balances
+        user_id = None if cache is None else _session_user_id()
+        if cache is not None:
+            self.balances = _read_accounts_cache(cache, max_age, user_id)
+        # balances read from the cache may be outdated
+        self.cached = cache is not None and self.balances is not None
+        if self.balances is None:
+            self.balances = self._list_balances()
+            if cache is not None:
+                _write_accounts_cache(cache, self.balances, user_id)
+
+    @staticmethod
+    def _list_balances():
+        endpoints = _account_endpoints()
+        with concurrent.futures.ThreadPoolExecutor(len(endpoints)) as executor:
+            return _balances(
+                account
+                for accounts in executor.map(_list_all, endpoints)
+                for account in accounts
             )
-        }
 
     def ids(self):
         """
@@ -202,87 +743,684 @@ class Accounts:  # pylint: disable=too-few-public-methods
         for id_, val in self.balances.items():
             yield id_, val[3]
 
+    def balance(self, account_id):
+        """
+        return the balance of an account as 'value currency'
+        """
+        _, currency, value, _ = self.balances[account_id]
+        return f"{value} {currency}"
+
+    def listed_balance(self, account_id):
+        """
+        return the `balance` of an account unless it was read from the
+        cache, then None (see `Payments.sync_account`)
+        """
+        return None if self.cached else self.balance(account_id)
+
     def __repr__(self):
         return "\n".join(
             (f"{v[0]} ({k}): {v[2]} {v[1]}" for k, v in self.balances.items())
         )
 
 
-def _export(fname, payments, user, account_name, mode):
-    """Do the exporting in various formats"""
+def _fetch_accounts(fetch, account_ids, jobs=1):
+    """Call `fetch(account_id)` for every account in `account_ids`.
+
+    With `jobs` > 1 the accounts are fetched by a pool of threads. All threads
+    share the process wide BunqContext, so it must be loaded (and the session
+    be active) before, see `_setup_context`. Results are returned in the order
+    of `account_ids`, so the output does not depend on the number of jobs."""
+    if jobs <= 1:
+        return [fetch(account_id) for account_id in account_ids]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(fetch, account_ids))
+
+
+def _export_name(fname, user, account_name):
+    """Return the name of the exports without extension"""
     if fname is None:
         fname = "bunq_%s" % user.id_
-    fname += "_%s" % account_name
-    payments.to_csv(fname + ".csv", mode)
+    return fname + "_%s" % account_name
+
+
+def _export(  # pylint: disable=too-many-arguments
+    fname, payments, user, account_name, mode, json_lines=False, formats=_FORMATS[:2]
+):
+    """Do the exporting in various formats"""
+    fname = _export_name(fname, user, account_name)
+    for fmt in formats:
+        _write(f"{fname}.{fmt}", fmt, payments, mode, json_lines)
+
+
+def _write(path, fmt, payments, mode, json_lines):
+    """Write 'payments' to 'path' in the format 'fmt'"""
+    if fmt == "csv":
+        payments.to_csv(path, mode)
+    elif fmt == "json":
+        payments.to_json(path, json_lines)
+    else:
+        getattr(payments, "to_" + fmt)(path)
+    _log.info("Wrote %s", path)
+
+
+def _export_stream(  # pylint: disable=too-many-arguments,too-many-locals
+    fname,
+    account_id,
+    count,
+    user,
+    account_name,
+    mode,
+    json_lines=False,
+    since=None,
+    until=None,
+    prefetch=0,
+    aggregates=None,
+):
+    """Export the last 'count' payments of 'account_id' page by page.
+
+    Every fetched page is flattened and spooled to a temporary file, so only
+    one page (plus the 'prefetch' pages fetched ahead) is kept in memory. The
+    pages are then appended to the exports
+    oldest first, which gives the same files as `_export`. Every page is
+    added to the `Aggregates` 'aggregates' if given. Returns the number
+    of exported payments."""
+    import pandas
+    from bunq.sdk.json import converter
+
+    fname = _export_name(fname, user, account_name)
+    total = 0
+    with tempfile.TemporaryDirectory(prefix="bunqexport") as spool:
+        pages = []
+        for page in _iter_pages(
+            account_id, 200, since=since, until=until, prefetch=prefetch
+        ):
+            page = page[: count - total]
+            total += len(page)
+            frame = _records_to_dataframe(
+                converter.serialize(p) for p in reversed(page)
+            )
+            if len(frame):
+                if aggregates is not None:
+                    aggregates.update(frame)
+                path = os.path.join(spool, "%d.pkl" % len(pages))
+                frame.to_pickle(path)
+                pages.append((path, frame.columns))
+            if total >= count:
+                break
+        pages.reverse()
+        columns = list(dict.fromkeys(c for _, cols in pages for c in cols))
+
+        with open(fname + ".csv", "w", newline="", encoding="utf-8") as csv_file:
+            with open(fname + ".json", "w", encoding="utf-8") as json_file:
+                json_file.write("" if json_lines else "[")
+                if not pages:
+                    Payments(pandas.DataFrame()).to_csv(csv_file, mode)
+                for index, (path, _) in enumerate(pages):
+                    payments = Payments(
+                        pandas.read_pickle(path).reindex(columns=columns)
+                    )
+                    payments.to_csv(csv_file, mode, header=index == 0)
+                    chunk = io.StringIO()
+                    payments.to_json(chunk, json_lines)
+                    if json_lines:
+                        json_file.write(chunk.getvalue().rstrip("\n") + "\n")
+                    else:
+                        json_file.write(("," if index else "") + chunk.getvalue()[1:-1])
+                json_file.write("" if json_lines else "]")
     _log.info("Wrote %s", fname + ".csv")
-    payments.to_json(fname + ".json")
     _log.info("Wrote %s", fname + ".json")
+    return total
 
 
-def payments_as_dataframe(
+@registry.timed("stage_seconds", stage="payments_as_dataframe")
+def payments_as_dataframe(  # pylint: disable=too-many-arguments,too-many-locals
     conf: str = "bunq-sandbox.conf",
     payments_per_account: Optional[int] = None,
-    df_old: Optional[pandas.DataFrame] = None,
+    df_old: Optional["pandas.DataFrame"] = None,
+    jobs: int = 1,
+    store: Optional[str] = None,
+    since=None,
+    until=None,
+    accounts_cache: Optional[str] = None,
+    checkpoint: Optional[str] = None,
+    prefetch: int = 0,
+    repair_gaps: bool = False,
+    aggregates: Optional[str] = None,
+    compact: bool = False,
 ):
     """Fetch payments from all accounts as pandas.DataFrame.
 
     If payments_per_account not provided, all payments will be downloaded.
 
-    Optionally pass an incomplete pandas.DataFrame to `df_old` such that
-    existing data isn't downloaded again."""
-    _setup_context(conf)
-    accounts = Accounts()
+    Only payments created from `since` (inclusive) to `until` (exclusive) are
+    downloaded, if given (dates, datetimes or strings like "2020-01-31", not
+    with `store`). Paging stops at the first payment older than `since`.
+
+    Optionally pass an incomplete pandas.DataFrame to `df_old` (as returned by
+    an earlier call) such that existing data isn't downloaded again. Known
+    payments on the page with the newest known one of an account are compared
+    by their `updated`, the ones updated since replace their old version.
+
+    Alternatively pass the path of a local payment `store` (see `PaymentStore`),
+    only payments newer than the stored ones are downloaded and all stored
+    payments are returned.
+
+    Use `jobs` > 1 to fetch that many accounts in parallel. Within an
+    account, `prefetch` > 0 requests up to that many pages ahead while the
+    current page is processed, which helps single large accounts.
+
+    The list of accounts may be cached for a few minutes in the file
+    `accounts_cache`, see `Accounts`.
+
+    Long downloads may save their progress in the file `checkpoint` (not with
+    `store`): called again with the same arguments after an interruption, the
+    download continues at the last fetched page. The file is removed when all
+    accounts are downloaded.
+
+    With `repair_gaps` the balance chains of the accounts are checked and the
+    payments missing in them are fetched (and stored), see `gaps`.
+
+    The payments not counted before are added to the totals in the file
+    `aggregates`, see `Aggregates`.
+
+    The amounts are floats, with `compact` integer cents (e.g.
+    'amount.cents') and repeating strings are categoricals, see
+    `Payments.compact`. A `df_old` must then be compact as well."""
+    _setup_context(conf, max(10, jobs))
+    accounts = Accounts(accounts_cache)
     if payments_per_account is None:
         payments_per_account = sys.maxsize
-    dfs = [] if df_old is None else [df_old]
-    for account_id, account_name in accounts.ids():
-        if df_old is not None:
-            present_ids = set(df_old[df_old["monetary_account_id"] == account_id].id)
-        else:
-            present_ids = set()
-        df_of_account = Payments.fetch_account(
-            account_id, payments_per_account, present_ids
+    if store is not None:
+        with PaymentStore(store) as payment_store:
+            combined = _combine(
+                accounts,
+                lambda account_id: Payments.sync_account(
+                    payment_store,
+                    account_id,
+                    payments_per_account,
+                    accounts.listed_balance(account_id),
+                ).payments,
+                jobs,
+                compact=compact,
+            )
+            if repair_gaps:
+                combined = _repair_gaps(combined, payment_store, prefetch)
+            return _aggregate(aggregates, combined)
+
+    present_ids = _present_ids(df_old)
+    saved = None if checkpoint is None else Checkpoint(checkpoint)
+
+    def fetch(account_id):
+        return Payments.fetch_account(
+            account_id,
+            payments_per_account,
+            present_ids.get(account_id),
+            since=since,
+            until=until,
+            checkpoint=saved,
+            prefetch=prefetch,
         ).payments
+
+    try:
+        combined = _combine(accounts, fetch, jobs, df_old, compact)
+    finally:
+        if saved is not None:
+            saved.close()
+    if checkpoint is not None:
+        os.remove(checkpoint)
+    if repair_gaps:
+        combined = _repair_gaps(combined, prefetch=prefetch)
+    return _aggregate(aggregates, combined)
+
+
+def _aggregate(path, frame):
+    """Add the payments in 'frame' to the `Aggregates` at 'path' (if not
+    None), return 'frame'"""
+    if path is not None:
+        from .aggregates import Aggregates
+
+        with Aggregates(path) as aggregates:
+            aggregates.update(frame)
+    return frame
+
+
+def _repair_gaps(frame, store=None, prefetch=0):
+    """Fetch the payments missing in the balance chains of 'frame', see `gaps`"""
+    from . import gaps
+
+    return gaps.repair(frame, store=store, prefetch=prefetch)[0]
+
+
+def _present_ids(df_old):
+    """Return the payment ids per account in 'df_old', mapped to their
+    'updated' in nanoseconds (see `_cut_page`)"""
+    if df_old is None:
+        return {}
+    return {
+        account_id: dict(
+            zip(group["id"].tolist(), group["updated"].astype("int64").tolist())
+        )
+        for account_id, group in df_old.groupby("monetary_account_id")[
+            ["id", "updated"]
+        ]
+    }
+
+
+def _merge(df_old, df_new):
+    """Merge the payments 'df_new' into 'df_old', both sorted newest first.
+
+    Payments of 'df_old' which are in 'df_new' again are replaced by the new
+    version, e.g. if they were 'updated'. New payments are usually newer than
+    all old ones, then the frames are just appended instead of sorted again."""
+    import pandas
+
+    if df_new.empty:
+        return df_old
+    refetched = df_old["id"].isin(df_new["id"])
+    if refetched.any():
+        old_updated = df_old.loc[refetched].set_index("id")["updated"]
+        new_updated = df_new.set_index("id")["updated"].reindex(old_updated.index)
+        _log.info("updated %d payments", (old_updated != new_updated).sum())
+        df_old = df_old[~refetched]
+    merged = pandas.concat([df_new, df_old])
+    if df_old.empty or (
+        df_old["created"].is_monotonic_decreasing
+        and df_new["created"].iloc[-1] >= df_old["created"].iloc[0]
+    ):
+        return merged
+    return merged.sort_values("created", ascending=False, kind="stable")
+
+
+def _combine(accounts, fetch, jobs, df_old=None, compact=False):
+    """Fetch the dataframes of all 'accounts' and merge them into 'df_old'
+
+    The amounts become floats, or with 'compact' the frame is `_compact`
+    (then 'df_old' must be compact as well)."""
+    import pandas
+
+    account_names = dict(accounts.ids())
+    dfs = []
+    for df_of_account, account_name in zip(
+        _fetch_accounts(fetch, list(account_names), jobs), account_names.values()
+    ):
+        if df_of_account.empty and df_old is not None:
+            continue
         df_of_account["account_name"] = account_name
         dfs.append(df_of_account)
+    if df_old is not None and not dfs:
+        return df_old
     combined_df = pandas.concat(dfs)
-    for col in ("amount.value", "balance_after_mutation.value"):
-        combined_df[col] = combined_df[col].astype(float)
-    return combined_df.sort_values("created", ascending=False)
+    if compact:
+        combined_df = _compact(combined_df)
+    else:
+        for col in _AMOUNT_COLUMNS:
+            combined_df[col] = combined_df[col].astype(float)
+    combined_df = combined_df.sort_values("created", ascending=False, kind="stable")
+    if df_old is None:
+        return combined_df
+    merged = _merge(df_old, combined_df)
+    # categoricals of different categories are concatenated as objects
+    return _compact(merged) if compact else merged
 
 
-def main():
-    """main entrypoint"""
+def _add_profile_arguments(parser):
+    parser.add_argument(
+        "--vorlagen",
+        default=None,
+        metavar="FILE",
+        help="Vorlagen.dat of Finanzmanager, with --mode lexware only the"
+        " columns of its import profile are written in its number format",
+    )
+    parser.add_argument(
+        "--profile",
+        default="bunq",
+        help="name of the import profile in --vorlagen (default bunq)",
+    )
+
+
+def _read_profile(parser, args):
+    """Replace 'args.mode' by the import profile of '--vorlagen'"""
+    if args.vorlagen is None:
+        return
+    if args.mode != "lexware":
+        parser.error("--vorlagen needs --mode lexware")
+    from . import lexware
+
+    try:
+        args.mode = lexware.read_profile(args.vorlagen, args.profile)
+    except (OSError, ValueError, SyntaxError) as error:
+        parser.error(f"--vorlagen: {error}")
+
+
+def _parser():
+    """Return the argument parser of the command line interface"""
     parser = argparse.ArgumentParser()
     parser.add_argument("--conf", default="bunq-sandbox.conf", help="api config file")
     parser.add_argument(
         "--outfile", "-o", default=None, help="name of the export csv file"
     )
-    parser.add_argument("--payments", default=200, type=int, help="Number of payments")
+    parser.add_argument(
+        "--payments",
+        default=None,
+        type=int,
+        help="Number of payments (default 200, unlimited with --since)",
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        type=datetime.date.fromisoformat,
+        help="only payments created on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--until",
+        default=None,
+        type=datetime.date.fromisoformat,
+        help="only payments created before this date (YYYY-MM-DD)",
+    )
     parser.add_argument("--verbose", "-v", default=False, action="store_true")
+    parser.add_argument(
+        "--max-rows",
+        default=20,
+        type=int,
+        help="payments printed per account, the oldest and newest half"
+        " (default 20, 0 prints all)",
+    )
+    parser.add_argument(
+        "--summary",
+        default=False,
+        action="store_true",
+        help="print only the number of payments, their period and totals"
+        " per account",
+    )
     parser.add_argument("--mode", choices=["raw", "lexware"], default="raw")
+    _add_profile_arguments(parser)
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        default=1,
+        type=int,
+        help="Number of accounts to fetch in parallel",
+    )
+    parser.add_argument(
+        "--prefetch",
+        default=0,
+        type=int,
+        metavar="PAGES",
+        help="request up to PAGES pages of an account ahead while processing"
+        " the current one",
+    )
+    parser.add_argument(
+        "--repair-gaps",
+        default=False,
+        action="store_true",
+        help="fetch payments missing in the balance chain of an account",
+    )
+    parser.add_argument(
+        "--aggregates",
+        default=None,
+        metavar="FILE",
+        help="add the fetched payments to the totals per account, month, type"
+        " and counterparty in this file (see: bunqexport totals FILE)",
+    )
+    parser.add_argument(
+        "--accounts-cache",
+        default=None,
+        help="cache the list of accounts in this file",
+    )
+    parser.add_argument(
+        "--accounts-cache-ttl",
+        default=300,
+        type=int,
+        help="seconds to use the cached accounts (default 300)",
+    )
+    parser.add_argument(
+        "--watch",
+        default=None,
+        type=int,
+        metavar="SECONDS",
+        help="keep running and add new payments to the exports every SECONDS",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="write timings and counters to this file"
+        " (prometheus textfile if it ends in .prom, else json)",
+    )
+    parser.add_argument(
+        "--json-lines",
+        default=False,
+        action="store_true",
+        help="write the json export as JSON Lines",
+    )
+    parser.add_argument(
+        "--append",
+        default=False,
+        action="store_true",
+        help="fetch only payments newer than the last one in the existing csv"
+        " and json exports and append them",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="save the progress of the download in this file"
+        " (removed after the export)",
+    )
+    parser.add_argument(
+        "--resume",
+        default=False,
+        action="store_true",
+        help="continue the interrupted download saved in --checkpoint",
+    )
+    fetch_mode = parser.add_mutually_exclusive_group()
+    fetch_mode.add_argument(
+        "--store",
+        default=None,
+        help="local payment database, fetch only new payments and export all stored",
+    )
+    fetch_mode.add_argument(
+        "--stream",
+        default=False,
+        action="store_true",
+        help="write the exports page by page with bounded memory",
+    )
+    parser.add_argument(
+        "--format",
+        action="append",
+        choices=_FORMATS,
+        help="export format, may be repeated (default: csv and json)",
+    )
+
+    return parser
 
-    args = parser.parse_args()
+
+def _parse_args(parser, argv=None):
+    """Parse and check the arguments 'argv' (default: command line)"""
+    args = parser.parse_args(argv)
+    if args.store and (args.since or args.until):
+        parser.error("--since/--until can not be used with --store")
+    if args.payments is None:
+        args.payments = sys.maxsize if args.since else 200
+    if args.max_rows <= 0:
+        args.max_rows = None
+    args.format = list(dict.fromkeys(args.format or _FORMATS[:2]))
+    arrow = sorted(set(args.format) - set(_FORMATS[:2]))
+    if arrow and importlib.util.find_spec("pyarrow") is None:
+        parser.error(
+            f"--format {'/'.join(arrow)} needs pyarrow:"
+            " pip install bunqexport[arrow]"
+        )
+    if args.stream and set(args.format) != set(_FORMATS[:2]):
+        parser.error("--stream only writes csv and json")
+    if args.watch is not None and args.stream:
+        parser.error("--watch can not be used with --stream")
+    if args.repair_gaps and args.stream:
+        parser.error("--repair-gaps can not be used with --stream")
+    if args.append and (args.stream or args.watch is not None):
+        parser.error("--append can not be used with --stream or --watch")
+    if args.append and not set(args.format) <= set(_FORMATS[:2]):
+        parser.error("--append only appends to csv and json")
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint")
+    if args.checkpoint and (args.store or args.stream or args.watch is not None):
+        parser.error("--checkpoint can not be used with --store, --stream or --watch")
+    _read_profile(parser, args)
+    return args
+
+
+def _setup_logging(verbose):
     logging.basicConfig(
-        level=logging.DEBUG if args.verbose else logging.INFO,
+        level=logging.DEBUG if verbose else logging.INFO,
         format="[%(levelname)-7s] %(message)s",
         stream=sys.stderr,
     )
+
+
+def _report(args, account_name, payments):
+    """Return the console output of the 'payments' of an account"""
+    from . import console
+
+    return console.report(account_name, payments, args.max_rows, args.summary)
+
+
+def _run(args, output=True):  # pylint: disable=too-many-locals,too-many-branches
+    """Export the payments of all accounts as given by the parsed 'args'.
+
+    Prints payments and balances unless 'output' is false, returns the number
+    of exported payments."""
+    from bunq.sdk.model import generated
+
+    from . import append
+    from .aggregates import Aggregates
+
     # connect
-    _setup_context(args.conf)
-    user = generated.endpoint.User.get().value.get_referenced_object()
+    token = _setup_context(args.conf, max(10, args.jobs))
+    user = _api_call("User", generated.endpoint.User.get)
+    user = user.value.get_referenced_object()
 
-    accounts = Accounts()
+    accounts = Accounts(args.accounts_cache, args.accounts_cache_ttl)
+    payment_store = None if args.store is None else PaymentStore(args.store)
+    checkpoint = None
+    if args.checkpoint is not None:
+        if not args.resume and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        checkpoint = Checkpoint(args.checkpoint)
+    aggregates = None if args.aggregates is None else Aggregates(args.aggregates)
+    # ids of the last payments in the exports to append to, per account
+    exported = {}
 
-    for account_id, account_name in accounts.ids():
-        payments = Payments.fetch_account(account_id, args.payments)
-        _export(args.outfile, payments, user, account_name, args.mode)
-        print(payments)
+    def fetch(account_id):
+        since_id = None
+        if args.append:
+            exported[account_id] = append.newest_ids(
+                _export_name(args.outfile, user, account_names[account_id]),
+                args.format,
+            )
+            if exported[account_id] is not None:
+                since_id = min(exported[account_id].values())
+        if payment_store is None:
+            payments = Payments.fetch_account(
+                account_id,
+                args.payments if since_id is None else sys.maxsize,
+                since_id=since_id,
+                since=args.since,
+                until=args.until,
+                checkpoint=checkpoint,
+                prefetch=args.prefetch,
+            )
+        else:
+            payments = Payments.sync_account(
+                payment_store,
+                account_id,
+                args.payments,
+                accounts.listed_balance(account_id),
+            )
+        if args.repair_gaps:
+            payments = Payments(
+                _repair_gaps(payments.payments, payment_store, args.prefetch)
+            )
+        if aggregates is not None:
+            aggregates.update(payments.payments)
+        return payments
+
+    def stream(account_id):
+        return _export_stream(
+            args.outfile,
+            account_id,
+            args.payments,
+            user,
+            account_names[account_id],
+            args.mode,
+            args.json_lines,
+            args.since,
+            args.until,
+            args.prefetch,
+            aggregates,
+        )
+
+    account_names = dict(accounts.ids())
+    all_payments = []
+    try:
+        if args.stream:
+            rows = sum(_fetch_accounts(stream, list(account_names), args.jobs))
+        else:
+            all_payments = _fetch_accounts(fetch, list(account_names), args.jobs)
+            rows = sum(len(payments) for payments in all_payments)
+    finally:
+        for database in (payment_store, checkpoint, aggregates):
+            if database is not None:
+                database.close()
+    for (account_id, account_name), payments in zip(
+        account_names.items(), all_payments
+    ):
+        if exported.get(account_id) is not None:
+            append.add_new(payments, args.mode, exported[account_id])
+        else:
+            _export(
+                args.outfile,
+                payments,
+                user,
+                account_name,
+                args.mode,
+                args.json_lines,
+                args.format,
+            )
+        if output:
+            print(_report(args, account_name, payments))
+    if checkpoint is not None:
+        os.remove(args.checkpoint)
 
-    print(accounts)
+    if output:
+        print(accounts)
 
     # disconnect
-    bunq.sdk.context.bunq_context.BunqContext.api_context().save(args.conf)
+    _save_context(args.conf, token)
+    return rows
+
+
+def main():
+    """main entrypoint"""
+    from . import offline
+
+    if sys.argv[1:2] and sys.argv[1] in offline.COMMANDS:
+        offline.main(sys.argv[1:])
+        return
+    parser = _parser()
+    parser.epilog = (
+        "offline commands on saved json exports (without api access): "
+        "bunqexport {render,summary,check,totals} --help"
+    )
+    args = _parse_args(parser)
+    _setup_logging(args.verbose)
+    try:
+        if args.watch:
+            from .watch import watch
+
+            watch(args)
+        else:
+            _run(args)
+    finally:
+        if args.metrics_file:
+            registry.write(args.metrics_file)
 
 
 if __name__ == "__main__":
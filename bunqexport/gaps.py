@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Gaps in the payment history, found by the balance chain of each account.
+
+Every payment has its `amount` and the `balance_after_mutation`, so in a
+complete history of an account the balance of the previous payment plus the
+amount gives the balance after it. `find_gaps` checks this for all payments
+at once, `repair` fetches only the payments between the two around each gap
+and adds them to the history.
+
+Missing payments of 0.00 do not change the balance and are not found.
+"""
+
+import logging
+from collections import namedtuple
+
+from . import export
+
+__all__ = ["Repair", "find_gaps", "repair"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+_GAP_COLUMNS = (
+    "monetary_account_id",
+    "older_id",
+    "newer_id",
+    "older_created",
+    "newer_created",
+    "missing_cents",
+)
+
+# a repaired gap: the ids of the payments around it, the missing amount, the
+# number of payments fetched for it and whether they close the gap
+Repair = namedtuple(
+    "Repair",
+    ("account_id", "older_id", "newer_id", "missing_cents", "fetched", "closed"),
+)
+
+
+def find_gaps(frame):
+    """Return the gaps in the balance chains of the payments in 'frame'.
+
+    Returns a DataFrame with a row per gap: the account, the ids and creation
+    times of the payments around it and the missing amount in cents. Payments
+    are ordered by id within each account, the oldest payment of an account
+    starts its chain."""
+    import pandas
+
+    if frame.empty:
+        return pandas.DataFrame(columns=_GAP_COLUMNS)
+    chain = pandas.DataFrame(
+        {
+            "monetary_account_id": frame["monetary_account_id"].to_numpy(),
+            "id": frame["id"].to_numpy(),
+            "created": frame["created"].to_numpy(),
+            "amount": export._amount_cents(frame, "amount.value").to_numpy(),
+            "balance": export._amount_cents(
+                frame, "balance_after_mutation.value"
+            ).to_numpy(),
+        }
+    )
+    chain = chain.drop_duplicates("id").sort_values(
+        ["monetary_account_id", "id"], kind="stable"
+    )
+    previous = chain.groupby("monetary_account_id")[["id", "created", "balance"]]
+    previous = previous.shift(1)
+    missing = chain["balance"] - chain["amount"] - previous["balance"]
+    gap = previous["id"].notna() & missing.ne(0) & missing.notna()
+    return pandas.DataFrame(
+        {
+            "monetary_account_id": chain["monetary_account_id"][gap],
+            "older_id": previous["id"][gap].astype("int64"),
+            "newer_id": chain["id"][gap],
+            "older_created": previous["created"][gap],
+            "newer_created": chain["created"][gap],
+            "missing_cents": missing[gap].astype("int64"),
+        },
+        columns=_GAP_COLUMNS,
+    ).reset_index(drop=True)
+
+
+def _refetch(account_id, older_id, newer_id, prefetch=0):
+    """Fetch the serialized payments of 'account_id' between the payments
+    'older_id' and 'newer_id' (both exclusive), newest first"""
+    from bunq.sdk.json import converter
+
+    records = []
+    params = {"count": "200", "older_id": str(newer_id)}
+    pages = export._prefetch(
+        export._iter_cursor_pages(account_id, 200, params), prefetch
+    )
+    try:
+        for page, _ in pages:
+            page, last = export._cut_page(page, set(), older_id, None, None)
+            records.extend(converter.serialize(p) for p in page)
+            if last:
+                break
+    finally:
+        pages.close()
+    return records
+
+
+def repair(frame, gaps=None, store=None, prefetch=0):  # pylint: disable=too-many-locals
+    """Fetch the payments missing in the 'gaps' (default: `find_gaps`) of
+    'frame' and return (repaired frame, list of `Repair`).
+
+    Only the pages between the payments around each gap are requested. The
+    payments are added to the `PaymentStore` 'store' if given. The repaired
+    frame keeps the order (by 'created') and amount types of 'frame', also
+    if it is compact (see `Payments.compact`)."""
+    import pandas
+
+    if gaps is None:
+        gaps = find_gaps(frame)
+    repairs = []
+    fetched = []
+    for gap in gaps.itertuples(index=False):
+        account_id, older_id, newer_id, missing = (
+            int(gap.monetary_account_id),
+            int(gap.older_id),
+            int(gap.newer_id),
+            int(gap.missing_cents),
+        )
+        records = _refetch(account_id, older_id, newer_id, prefetch)
+        if store is not None:
+            store.add(account_id, records)
+        payments = export.Payments.from_records(reversed(records)).payments
+        cents = int(export._cents(payments["amount.value"]).sum()) if records else 0
+        repairs.append(
+            Repair(
+                account_id, older_id, newer_id, missing, len(records), cents == missing
+            )
+        )
+        _log.info(
+            "account %s: fetched %d payments between %d and %d, gap %s",
+            account_id,
+            len(records),
+            older_id,
+            newer_id,
+            "closed" if repairs[-1].closed else "still open",
+        )
+        if records:
+            fetched.append(payments)
+    if not fetched:
+        return frame, repairs
+    new = pandas.concat(fetched)
+    if "account_name" in frame:
+        names = frame.groupby("monetary_account_id")["account_name"].first()
+        new["account_name"] = new["monetary_account_id"].map(names)
+    compact = export._cents_column(export._AMOUNT_COLUMNS[0]) in frame
+    if compact:
+        new = export._compact(new)
+    for col in export._AMOUNT_COLUMNS:
+        if col in frame:
+            new[col] = new[col].astype(frame[col].dtype)
+    repaired = pandas.concat([frame, new]).drop_duplicates("id", keep="last")
+    repaired = repaired.sort_values(
+        "created",
+        ascending=bool(frame["created"].is_monotonic_increasing),
+        kind="stable",
+    )
+    return export._compact(repaired) if compact else repaired, repairs
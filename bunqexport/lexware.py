@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Lexware exports driven by an import profile of `Vorlagen.dat`.
+
+Finanzmanager imports a csv by the positions of its columns, the import
+profile (`Vorlagen.dat`) assigns them to the fields of a statement and holds
+the date and number format. `read_profile` reads such a profile, its `write`
+only fills the columns the profile uses and leaves the others empty, so the
+positions stay those of the full export the profile was made with. Dates and
+amounts are formatted for whole columns at once.
+"""
+
+import csv
+import sys
+from xml.etree import ElementTree
+
+from . import export
+
+__all__ = ["LAYOUT", "Profile", "read_profile"]
+
+# pylint: disable=import-outside-toplevel,protected-access
+
+# columns of the full lexware export the source positions of the profiles
+# refer to
+LAYOUT = (
+    "allow_chat",
+    "attachment",
+    "created",
+    "description",
+    "id",
+    "monetary_account_id",
+    "request_reference_split_the_bill",
+    "sub_type",
+    "type",
+    "updated",
+    "alias.name",
+    "alias.type",
+    "alias.value",
+    "amount.currency",
+    "amount.value",
+    "balance_after_mutation.currency",
+    "balance_after_mutation.value",
+    "counterparty_alias.name",
+    "counterparty_alias.type",
+    "counterparty_alias.value",
+)
+
+_DATE_COLUMNS = ("created", "updated")
+
+_DIVIDERS = {"COMMA": ",", "SEMICOLON": ";", "TAB": "\t", "SPACE": " "}
+
+_QUOTES = {"DOUBLEQUOTE": '"', "SINGLEQUOTE": "'"}
+
+# parts of the date formats of Finanzmanager, longest first
+_DATE_PARTS = (("JJJJ", "%Y"), ("JJ", "%y"), ("TT", "%d"), ("MM", "%m"))
+
+
+def _date_format(value):
+    """Return the strftime format of a date format like 'TT.MM.JJJJ'"""
+    for part, directive in _DATE_PARTS:
+        value = value.replace(part, directive)
+    return value
+
+
+class Profile:  # pylint: disable=too-few-public-methods
+    """
+    import profile of Finanzmanager, writes the columns it uses
+
+    'positions' are the positions in `LAYOUT` assigned to a field of the
+    statement, 'decimal' and 'thousands' the separators of amounts
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        name,
+        positions,
+        date_format="%d.%m.%Y",
+        decimal=",",
+        thousands=".",
+        delimiter=",",
+        quotechar='"',
+    ):
+        self.name = name
+        self.positions = tuple(sorted(set(positions)))
+        self.date_format = date_format
+        self.decimal = decimal
+        self.thousands = thousands
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, {self.columns})"
+
+    @property
+    def columns(self):
+        """Names of the columns used by the profile"""
+        return [LAYOUT[position] for position in self.positions]
+
+    def _amounts(self, cents):
+        """Format integer cents with the decimal and thousands separators"""
+        units = (cents.abs() // 100).astype(str)
+        if self.thousands:
+            units = units.str.replace(r"\B(?=(\d{3})+$)", self.thousands, regex=True)
+        return (
+            cents.lt(0).map({True: "-", False: ""})
+            + units
+            + self.decimal
+            + (cents.abs() % 100).astype(str).str.zfill(2)
+        )
+
+    def _dates(self, dates):
+        return dates.dt.strftime(self.date_format)
+
+    def frame(self, payments):
+        """Return the flattened 'payments' as strings in the columns of
+        `LAYOUT` up to the last one used, unused columns are empty"""
+        import pandas
+
+        used = set(self.columns)
+        columns = {}
+        for name in LAYOUT[: self.positions[-1] + 1 if self.positions else 0]:
+            if name not in used or name not in payments:
+                columns[name] = ""
+            elif name in _DATE_COLUMNS:
+                columns[name] = export._by_value(
+                    payments[name].dt.normalize(), self._dates
+                )
+            elif name in export._AMOUNT_COLUMNS:
+                columns[name] = export._by_value(
+                    export._cents(payments[name]), self._amounts
+                )
+            else:
+                columns[name] = payments[name].fillna("").astype(str)
+        return pandas.DataFrame(columns, index=payments.index)
+
+    def write(self, payments, path_or_buf, header=True):
+        """Write the flattened 'payments' as csv for the profile"""
+        self.frame(payments).to_csv(  # pylint: disable=unexpected-keyword-arg
+            path_or_buf,
+            index=False,
+            header=header,
+            sep=self.delimiter,
+            quoting=csv.QUOTE_MINIMAL,
+            quotechar=self.quotechar or '"',
+            line_terminator="\n" if sys.platform == "win32" else "\r\n",
+        )
+
+
+def read_profile(path, name="bunq"):
+    """Read the import profile 'name' of the `Vorlagen.dat` at 'path'"""
+    root = ElementTree.parse(path).getroot()
+    for item in root.iterfind("PROFILES/ITEM"):
+        if item.findtext("Name") == name:
+            break
+    else:
+        raise ValueError(f"no profile {name!r} in {path}")
+    positions = set()
+    for col in item.iterfind("Columns/Col"):
+        for source in ("Source1", "Source2"):
+            position = int(col.findtext(source, "-1"))
+            if position >= len(LAYOUT):
+                raise ValueError(
+                    f"profile {name!r}: unknown column {position} in {path}"
+                )
+            if position >= 0:
+                positions.add(position)
+    decimal = "," if item.findtext("CurrencyFormat") == "COMMA" else "."
+    thousands = ""
+    if root.findtext("INFO/WAEHRUNG/DEZIMAL") == decimal:
+        thousands = root.findtext("INFO/WAEHRUNG/TAUSENDER", "")
+    return Profile(
+        name,
+        positions,
+        date_format=_date_format(item.findtext("DateFormat", "TT.MM.JJJJ")),
+        decimal=decimal,
+        thousands=thousands,
+        delimiter=_DIVIDERS.get(item.findtext("Divider"), ","),
+        quotechar=_QUOTES.get(item.findtext("FieldSeparator"), ""),
+    )
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Counters and timing histograms of an export.
+
+The export records into `registry`, e.g. the seconds of every api request and
+of the stages (parsing, writing, ...). Hooks added with `Metrics.add_hook` see
+every value as it is recorded, `Metrics.write` saves all as JSON or in the
+Prometheus textfile format (for the node exporter).
+"""
+
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+__all__ = ["Metrics", "registry"]
+
+# upper bounds (seconds) of the histogram buckets, like the prometheus client
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PREFIX = "bunqexport_"
+
+
+class _Histogram:  # pylint: disable=too-few-public-methods
+    """
+    count, sum and cumulative bucket counts of observed values
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        """Add 'value' to the histogram"""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+
+
+class Metrics:
+    """
+    thread safe counters and histograms, identified by name and labels
+
+    hooks are called with (kind, name, value, labels) for every recorded value,
+    kind is "counter" or "histogram"
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+
+    def add_hook(self, hook):
+        """Call 'hook(kind, name, value, labels)' for every recorded value"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Stop calling 'hook'"""
+        self._hooks.remove(hook)
+
+    def reset(self):
+        """Forget all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def count(self, name, value=1, **labels):
+        """Increase the counter 'name' by 'value'"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        for hook in self._hooks:
+            hook("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        """Record 'value' (seconds) in the histogram 'name'"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+        for hook in self._hooks:
+            hook("histogram", name, value, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Record the seconds of the with block in the histogram 'name'"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator recording the seconds of every call in the histogram 'name'"""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def counter_value(self, name, **labels):
+        """Return the value of a counter, 0 if never counted"""
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def snapshot(self):
+        """Return all values as json compatible dict"""
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append(
+                    {"labels": dict(labels), "value": value}
+                )
+            histograms = {}
+            for (name, labels), hist in sorted(self._histograms.items()):
+                histograms.setdefault(name, []).append(
+                    {
+                        "labels": dict(labels),
+                        "count": hist.count,
+                        "sum": hist.sum,
+                        "buckets": dict(zip(map(str, BUCKETS), hist.buckets)),
+                    }
+                )
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        """Return all values in the prometheus text format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, values in snapshot["counters"].items():
+            lines.append(f"# TYPE {_PREFIX}{name} counter")
+            for value in values:
+                lines.append(
+                    f"{_PREFIX}{name}{_labels(value['labels'])} {value['value']}"
+                )
+        for name, values in snapshot["histograms"].items():
+            lines.append(f"# TYPE {_PREFIX}{name} histogram")
+            for value in values:
+                labels = value["labels"]
+                for bound, count in value["buckets"].items():
+                    lines.append(
+                        f"{_PREFIX}{name}_bucket{_labels(labels, le=bound)} {count}"
+                    )
+                lines.append(
+                    f"{_PREFIX}{name}_bucket{_labels(labels, le='+Inf')}"
+                    f" {value['count']}"
+                )
+                lines.append(f"{_PREFIX}{name}_sum{_labels(labels)} {value['sum']}")
+                lines.append(f"{_PREFIX}{name}_count{_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write all values to 'path', in prometheus format if it ends in .prom
+
+        The file is replaced atomically, so collectors never read half of it."""
+        if path.endswith(".prom"):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fobj:
+            fobj.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in labels.items()
+        )
+        + "}"
+    )
+
+
+# the metrics of the export
+registry = Metrics()  # pylint: disable=invalid-name
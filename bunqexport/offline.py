@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Offline commands working on saved json exports, without the bunq sdk.
+
+    bunqexport render bunq_1_Main.json --mode lexware -o lexware_main
+    bunqexport summary bunq_*.json
+    bunqexport check bunq_*.json
+    bunqexport totals totals.db --by month --by counterparty
+
+`render` writes a json export (array or JSON Lines) again in other formats or
+modes, `summary` prints the number of payments, their period and the sums of
+incoming and outgoing amounts per currency. `check` prints the gaps in the
+balance chains of the exports (see `gaps`), repair them with `--repair-gaps`.
+`totals` prints the totals saved with `--aggregates` (see `aggregates`), json
+exports may be added to them with `--add`.
+"""
+
+import argparse
+import json
+import logging
+import os
+
+from . import console, export, gaps
+
+__all__ = ["COMMANDS", "load_export", "summarize", "main"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# pylint: disable=import-outside-toplevel
+
+COMMANDS = ("render", "summary", "check", "totals")
+
+# keys of the totals by the names of `--by`
+_TOTALS_BY = {
+    "account": "monetary_account_id",
+    "month": "month",
+    "type": "type",
+    "counterparty": "counterparty",
+}
+
+
+def load_export(path):
+    """Return the json export 'path' (array or JSON Lines) as `Payments`"""
+    import pandas
+
+    with open(path, encoding="utf-8") as fobj:
+        content = fobj.read()
+    if content.lstrip().startswith("["):
+        records = json.loads(content)
+    else:
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return export.Payments(pandas.DataFrame.from_records(records))
+
+
+def summarize(payments):
+    """Return the summary of 'payments' as text, see `console.summary`"""
+    return console.summary(payments.payments)
+
+
+def _render(args):
+    for path in args.exports:
+        payments = load_export(path)
+        fname = args.outfile or os.path.splitext(path)[0]
+        for fmt in args.format:
+            out = f"{fname}.{fmt}"
+            if os.path.abspath(out) == os.path.abspath(path):
+                _log.warning("Not overwriting %s", path)
+                continue
+            export._write(  # pylint: disable=protected-access
+                out, fmt, payments, args.mode, args.json_lines
+            )
+
+
+def _summary(args):
+    for path in args.exports:
+        print(f"{path}: {summarize(load_export(path))}")
+
+
+def _check(args):
+    for path in args.exports:
+        found = gaps.find_gaps(load_export(path).payments)
+        print(f"{path}: {len(found)} gaps")
+        for gap in found.itertuples(index=False):
+            print(
+                f"  account {gap.monetary_account_id}:"
+                f" {gap.missing_cents / 100:.2f} missing between payment"
+                f" {gap.older_id} ({gap.older_created:%d.%m.%Y})"
+                f" and {gap.newer_id} ({gap.newer_created:%d.%m.%Y})"
+            )
+
+
+def _totals(args):
+    from .aggregates import Aggregates
+
+    with Aggregates(args.aggregates) as aggregates:
+        for path in args.add:
+            added = aggregates.update(load_export(path).payments)
+            _log.info("Added %d payments of %s", added, path)
+        by = [_TOTALS_BY[name] for name in args.by or ("account", "month")]
+        totals = aggregates.totals(by)
+        closing = aggregates.closing_balances()
+    if totals.empty:
+        print(f"{args.aggregates}: no payments")
+        return
+    print(
+        totals.drop(columns="cents").to_string(
+            index=False, formatters={"amount": "{:.2f}".format}
+        )
+    )
+    for row in closing.itertuples(index=False):
+        print(
+            f"account {row.monetary_account_id}: {row.balance:.2f} {row.currency}"
+            f" after payment {row.id} ({row.month})"
+        )
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="bunqexport", description="offline commands on saved json exports"
+    )
+    parser.add_argument("--verbose", "-v", default=False, action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+    render = commands.add_parser(
+        "render", help="write json exports again in other formats or modes"
+    )
+    render.add_argument("exports", nargs="+", help="json exports")
+    render.add_argument(
+        "--outfile",
+        "-o",
+        default=None,
+        help="name of the output without extension (default: name of the export)",
+    )
+    render.add_argument("--mode", choices=["raw", "lexware"], default="raw")
+    export._add_profile_arguments(render)  # pylint: disable=protected-access
+    render.add_argument(
+        "--format",
+        action="append",
+        choices=export._FORMATS,  # pylint: disable=protected-access
+        help="output format, may be repeated (default: csv)",
+    )
+    render.add_argument(
+        "--json-lines",
+        default=False,
+        action="store_true",
+        help="write json as JSON Lines",
+    )
+    render.set_defaults(func=_render)
+    summary = commands.add_parser("summary", help="print a summary of json exports")
+    summary.add_argument("exports", nargs="+", help="json exports")
+    summary.set_defaults(func=_summary)
+    check = commands.add_parser(
+        "check", help="print the gaps in the balance chains of json exports"
+    )
+    check.add_argument("exports", nargs="+", help="json exports")
+    check.set_defaults(func=_check)
+    totals = commands.add_parser(
+        "totals", help="print the totals saved with --aggregates"
+    )
+    totals.add_argument("aggregates", help="file of --aggregates")
+    totals.add_argument(
+        "--by",
+        action="append",
+        choices=list(_TOTALS_BY),
+        help="sum per these keys and currency, may be repeated"
+        " (default: account and month)",
+    )
+    totals.add_argument(
+        "--add",
+        action="append",
+        default=[],
+        metavar="EXPORT",
+        help="first add the payments of this json export, may be repeated",
+    )
+    totals.set_defaults(func=_totals)
+    return parser
+
+
+def main(argv=None):
+    """entrypoint of the offline commands, e.g. `bunqexport summary FILE`"""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == "render":
+        args.format = args.format or ["csv"]
+        if args.outfile and len(args.exports) > 1:
+            parser.error("--outfile needs a single export")
+        export._read_profile(parser, args)  # pylint: disable=protected-access
+    export._setup_logging(args.verbose)  # pylint: disable=protected-access
+    args.func(args)
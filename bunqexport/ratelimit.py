@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Scheduling of bunq api requests within the rate limits.
+
+bunq allows 3 GET requests within any 3 consecutive seconds per endpoint.
+`RateLimiter` schedules the requests per endpoint within such a sliding
+window, shared by parallel fetches, and retries requests failing with 429,
+5xx or connection errors with a jittered exponential backoff.
+"""
+
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+
+__all__ = ["RateLimiter", "BUNQ_GET_LIMIT"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# (requests, seconds) for GET requests per endpoint
+BUNQ_GET_LIMIT = (3, 3.0)
+
+
+class _Window:
+    """
+    at most 'count' requests within any 'period' seconds
+    """
+
+    # keep some distance to the limit, the server sees requests a bit later
+    _MARGIN = 0.05
+
+    def __init__(self, count, period):
+        self.period = period * (1 + self._MARGIN)
+        self.times = collections.deque(maxlen=count)
+
+    def take(self):
+        """Reserve the next request, return the seconds to wait before it"""
+        now = time.monotonic()
+        start = now
+        if len(self.times) == self.times.maxlen:
+            start = max(now, self.times[0] + self.period)
+        self.times.append(start)
+        return start - now
+
+
+class RateLimiter:
+    """
+    Run api calls within a rate limit per endpoint and retry them on errors
+
+    'limit' is a tuple (requests, seconds) or None for no limit. Failed calls
+    are retried up to 'retries' times, waiting 'backoff' * 2**attempt seconds
+    (at most 'max_backoff'), randomized by half of it. Besides 429 and 5xx
+    responses the 'connection_errors' are retried (default: the connection
+    errors of requests, used by the sdk).
+
+    `call` is for blocking calls, `acall` for coroutines (see `aio`).
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        limit=BUNQ_GET_LIMIT,
+        retries=5,
+        backoff=1.0,
+        max_backoff=60.0,
+        connection_errors=None,
+    ):
+        self.limit = limit
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connection_errors = connection_errors
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, endpoint):
+        """Reserve a request to 'endpoint', return the seconds to wait for it"""
+        if self.limit is None:
+            return 0
+        with self._lock:
+            window = self._windows.get(endpoint)
+            if window is None:
+                window = self._windows[endpoint] = _Window(*self.limit)
+            delay = window.take()
+        if delay:
+            _log.debug("rate limit: waiting %.2fs for %s", delay, endpoint)
+        return delay
+
+    def acquire(self, endpoint):
+        """Block until a request to 'endpoint' is allowed"""
+        delay = self._reserve(endpoint)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, endpoint):
+        """Wait until a request to 'endpoint' is allowed"""
+        delay = self._reserve(endpoint)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _errors(self):
+        """Return the exceptions of failed calls which may be retried"""
+        # pylint: disable=import-outside-toplevel
+        from bunq.sdk.exception.api_exception import ApiException
+
+        if self.connection_errors is None:
+            import requests
+
+            self.connection_errors = (requests.exceptions.ConnectionError,)
+        return (ApiException,) + tuple(self.connection_errors)
+
+    def _retry_delay(self, endpoint, attempt, error):
+        """Return the seconds to wait before retrying, raise 'error' if final"""
+        # pylint: disable=import-outside-toplevel
+        from bunq.sdk.exception.api_exception import ApiException
+
+        if isinstance(error, ApiException):
+            retryable = error.response_code == 429 or error.response_code >= 500
+        else:
+            retryable = isinstance(error, self.connection_errors)
+        if attempt >= self.retries or not retryable:
+            raise error
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        _log.warning(
+            "%s failed (%s), retry %d in %.1fs",
+            endpoint,
+            getattr(error, "response_code", type(error).__name__),
+            attempt + 1,
+            delay,
+        )
+        return delay
+
+    def call(self, endpoint, func, *args, **kwargs):
+        """Call 'func' as request to 'endpoint' within the limit, retry on errors"""
+        attempt = 0
+        while True:
+            self.acquire(endpoint)
+            try:
+                return func(*args, **kwargs)
+            except self._errors() as error:
+                delay = self._retry_delay(endpoint, attempt, error)
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, endpoint, func, *args, **kwargs):
+        """Await 'func' as request to 'endpoint' within the limit, retry on errors"""
+        attempt = 0
+        while True:
+            await self.aacquire(endpoint)
+            try:
+                return await func(*args, **kwargs)
+            except self._errors() as error:
+                delay = self._retry_delay(endpoint, attempt, error)
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Local sqlite store of downloaded payments.
+
+The store keeps every payment (serialized like `Payment.to_json`) and per
+account the id of the newest stored payment, the watermark. Later runs only
+need to fetch payments newer than the watermark. The balance of an account at
+its last sync allows to skip accounts without changes altogether.
+"""
+
+import json
+import sqlite3
+import threading
+
+__all__ = ["PaymentStore"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY,
+    monetary_account_id INTEGER NOT NULL,
+    payment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_account
+    ON payments (monetary_account_id, id);
+CREATE TABLE IF NOT EXISTS watermarks (
+    monetary_account_id INTEGER PRIMARY KEY,
+    newest_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS balances (
+    monetary_account_id INTEGER PRIMARY KEY,
+    balance TEXT NOT NULL
+);
+"""
+
+
+class PaymentStore:
+    """
+    sqlite database with payments and sync watermarks per account
+
+    may be shared by the threads fetching accounts in parallel
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database"""
+        self._db.close()
+
+    def watermark(self, account_id):
+        """Return the id of the newest stored payment of 'account_id' or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT newest_id FROM watermarks WHERE monetary_account_id = ?",
+                (account_id,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def add(self, account_id, records):
+        """Store serialized payments and move the watermark of 'account_id'.
+
+        Payments already present are replaced, e.g. with a newer 'updated'."""
+        rows = [(r["id"], account_id, json.dumps(r)) for r in records]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO payments VALUES (?, ?, ?)", rows
+            )
+            self._db.execute(
+                "INSERT INTO watermarks VALUES (?, ?)"
+                " ON CONFLICT (monetary_account_id)"
+                " DO UPDATE SET newest_id = max(newest_id, excluded.newest_id)",
+                (account_id, max(row[0] for row in rows)),
+            )
+
+    def balance(self, account_id):
+        """Return the balance of 'account_id' at the last sync or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT balance FROM balances WHERE monetary_account_id = ?",
+                (account_id,),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set_balance(self, account_id, balance):
+        """Remember the 'balance' of 'account_id' after a sync"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO balances VALUES (?, ?)", (account_id, balance)
+            )
+
+    def records(self, account_id):
+        """Return all stored payments of 'account_id', oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payment FROM payments WHERE monetary_account_id = ?"
+                " ORDER BY id",
+                (account_id,),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
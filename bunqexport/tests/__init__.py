@@ -11,3 +11,16 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests of bunqexport, run with `python -m pytest` or `python -m unittest`
+"""
+import shutil
+import tempfile
+
+
+def temp_dir(test):
+    """Return a new temporary directory, removed after 'test' (a TestCase)"""
+    path = tempfile.mkdtemp(prefix="bunqexport")
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
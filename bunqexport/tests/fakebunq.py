@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Synthetic bunq data and a local stand-in for the bunq api for tests and
+benchmarks.
+
+    with FakeBunq({1: 1000000, 2: 50}, latency=0.05) as fake:
+        fake.install()  # load a matching api context into the BunqContext
+        export.Accounts()
+        ...
+
+Only the endpoints used by bunqexport are served: `user/{id}`, the
+monetary account listings and the payment listing with `older_id`
+pagination. Responses are signed, so the sdk validates them like the real
+ones.
+"""
+
+import base64
+import datetime
+import http.server
+import json
+import multiprocessing
+import re
+import threading
+import time
+import urllib.parse
+import warnings
+
+import numpy
+from bunq.sdk.context import api_context as sdk_api_context
+from bunq.sdk.context import bunq_context, installation_context, session_context
+from bunq.sdk.json import converter
+from bunq.sdk.model.core import session_token
+from bunq.sdk.model.generated import endpoint
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import PKCS1_v1_5
+
+USER_ID = 4711
+
+_TYPES = (
+    ("MASTERCARD", "PAYMENT"),
+    ("EBA_SCT", "SCT"),
+    ("BUNQ", "PAYMENT"),
+    ("SAVINGS", "PAYMENT"),
+    ("IDEAL", "PAYMENT"),
+)
+_COUNTERPARTIES = ("bunq", "Some Company", "PayPal (Europe)", "Felix Mustermann")
+_START = datetime.datetime(2019, 1, 1)
+
+# the listing endpoints of the monetary account types
+_ACCOUNT_TYPES = {
+    "monetary-account-bank": "MonetaryAccountBank",
+    "monetary-account-savings": "MonetaryAccountSavings",
+    "monetary-account-joint": "MonetaryAccountJoint",
+}
+
+
+class FakeAccount:
+    """
+    Lazily synthesized payment history of one monetary account
+
+    Only amounts and timestamps are kept (as numpy arrays), the payments are
+    built on request, so millions of payments are cheap.
+    """
+
+    def __init__(self, account_id, count, seed=0, first_id=1):
+        self.account_id = account_id
+        self.first_id = first_id
+        rnd = numpy.random.default_rng(seed)
+        self.cents = rnd.integers(-20000, 30000, count)
+        self.balance = numpy.cumsum(self.cents)
+        self.seconds = numpy.cumsum(rnd.integers(1, 36000, count))
+        self.kind = rnd.integers(0, len(_TYPES) * len(_COUNTERPARTIES), count)
+        # 'updated' of payments changed after their creation, by index
+        self.updated = {}
+
+    def __len__(self):
+        return len(self.cents)
+
+    @property
+    def balance_value(self):
+        """current balance as string"""
+        return "%.2f" % (self.balance[-1] / 100 if len(self) else 0)
+
+    def payment(self, index):
+        """Return payment number 'index' (0 is the oldest) in api format"""
+        payment_id = self.first_id + index
+        created = _START + datetime.timedelta(seconds=int(self.seconds[index]))
+        created = created.strftime("%Y-%m-%d %H:%M:%S.%f")
+        type_, sub_type = _TYPES[self.kind[index] % len(_TYPES)]
+        counterparty = _COUNTERPARTIES[self.kind[index] // len(_TYPES)]
+        return {
+            "id": payment_id,
+            "created": created,
+            "updated": self.updated.get(index, created),
+            "monetary_account_id": self.account_id,
+            "amount": {"value": "%.2f" % (self.cents[index] / 100), "currency": "EUR"},
+            "alias": {
+                "iban": "NL94BUNQ%010d" % self.account_id,
+                "display_name": "Felix Mustermann",
+                "country": "NL",
+            },
+            "counterparty_alias": {
+                "iban": "DE83%018d" % self.kind[index],
+                "display_name": counterparty,
+                "country": "DE",
+            },
+            "description": "%s %d" % (counterparty, payment_id),
+            "type": type_,
+            "sub_type": sub_type,
+            "balance_after_mutation": {
+                "value": "%.2f" % (self.balance[index] / 100),
+                "currency": "EUR",
+            },
+            "attachment": [],
+            "request_reference_split_the_bill": [],
+        }
+
+    def page(self, count, older_id=None):
+        """Return up to 'count' payments older than 'older_id', newest first"""
+        end = len(self) if older_id is None else max(older_id - self.first_id, 0)
+        end = min(end, len(self))
+        return [self.payment(i) for i in range(end - 1, max(end - count, 0) - 1, -1)]
+
+
+def iter_payments(account_id, count, seed=0, first_id=1):
+    """Yield `count` payments of `account_id` in api format, oldest first.
+
+    Ids and `created` are increasing and `balance_after_mutation` follows
+    from the amounts."""
+    account = FakeAccount(account_id, count, seed, first_id)
+    for index in range(count):
+        yield account.payment(index)
+
+
+def sdk_payments(payments):
+    """Deserialize api payments into sdk objects, as `Payment.list` does"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return [converter.deserialize(endpoint.Payment, p) for p in payments]
+
+
+class _Environment:  # pylint: disable=too-few-public-methods
+    """stands in for ApiEnvironmentType, pointing to the fake server"""
+
+    def __init__(self, uri_base):
+        self.uri_base = uri_base
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """serve the requests of the sdk from the data of the FakeBunq server"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def handle(self):
+        self.server.fake.count_request("connection")
+        super().handle()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        fake = self.server.fake
+        url = urllib.parse.urlparse(self.path)
+        params = {k: v[0] for k, v in urllib.parse.parse_qs(url.query).items()}
+        name = fake.count_request(url.path)
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake._is_limited(name):  # pylint: disable=protected-access
+            status, body = 429, {"Error": [{"error_description": "Too many requests"}]}
+        else:
+            status, body = fake.respond(url.path, params)
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Bunq-Client-Response-Id", "fake")
+        self.send_header("X-Bunq-Server-Signature", fake.sign(body))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeBunq:
+    """
+    Local http server serving synthetic accounts and payments
+
+    'accounts' maps account ids to the number of their payments, by default
+    all accounts are bank accounts. 'latency' (seconds) is added to every
+    response. With 'rate_limit' (requests, seconds) more requests per endpoint
+    within that window are answered with 429, like bunq does.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, accounts, latency=0.0, savings=(), joint=(), seed=0, rate_limit=None
+    ):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self._recent = {}
+        self.accounts = {
+            account_id: FakeAccount(account_id, count, seed + n, account_id * 10**8)
+            for n, (account_id, count) in enumerate(accounts.items())
+        }
+        self.account_types = {
+            account_id: "MonetaryAccountSavings"
+            if account_id in savings
+            else "MonetaryAccountJoint"
+            if account_id in joint
+            else "MonetaryAccountBank"
+            for account_id in accounts
+        }
+        self.requests = {}
+        self._lock = threading.Lock()
+        # small key, signing speed matters more than security here
+        self._server_key = RSA.generate(1024)
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def public_key(self):
+        """public key of the server (PEM) to validate its responses"""
+        return self._server_key.publickey().export_key().decode()
+
+    @property
+    def uri_base(self):
+        """base url of the api, like ApiEnvironmentType.uri_base"""
+        return "http://%s:%d/v1/" % self._server.server_address
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving"""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def sign(self, body):
+        """Sign 'body' like the bunq server"""
+        digest = SHA256.new(body)
+        return base64.b64encode(PKCS1_v1_5.new(self._server_key).sign(digest)).decode()
+
+    def count_request(self, path):
+        """Count requests per endpoint, payment listings count as 'payment'
+
+        opened connections are counted as 'connection'."""
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        name = "user" if name.isdigit() else name
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+        return name
+
+    def _is_limited(self, name):
+        """Register a request to 'name', tell whether it exceeds the limit"""
+        if self.rate_limit is None:
+            return False
+        count, seconds = self.rate_limit
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._recent.get(name, ()) if t > now - seconds]
+            self._recent[name] = recent + [now]
+            if len(recent) >= count:
+                self.requests["429"] = self.requests.get("429", 0) + 1
+                return True
+        return False
+
+    def respond(self, path, params):
+        """Return status and json body for the GET request of 'path'"""
+        path = path[len("/v1/") :].rstrip("/")
+        if path == "user/%d" % USER_ID:
+            return 200, {"Response": [{"UserPerson": self._user()}]}
+        match = re.fullmatch(r"user/%d/([a-z-]+)" % USER_ID, path)
+        if match and match.group(1) in _ACCOUNT_TYPES:
+            return 200, self._accounts(_ACCOUNT_TYPES[match.group(1)], params)
+        match = re.fullmatch(r"user/%d/monetary-account/(\d+)/payment" % USER_ID, path)
+        if match and int(match.group(1)) in self.accounts:
+            return 200, self._payments(int(match.group(1)), params)
+        return 404, {"Error": [{"error_description": "Not found: %s" % path}]}
+
+    @staticmethod
+    def _user():
+        return {
+            "id": USER_ID,
+            "display_name": "Felix Mustermann",
+            "session_timeout": 3600,
+        }
+
+    def _accounts(self, object_type, params):
+        ids = sorted(i for i, t in self.account_types.items() if t == object_type)
+        count = int(params.get("count", 10))
+        if "older_id" in params:
+            ids = [i for i in ids if i < int(params["older_id"])]
+        page = ids[::-1][:count]
+        response = [
+            {
+                object_type: {
+                    "id": account_id,
+                    "description": "Account %d" % account_id,
+                    "balance": {
+                        "value": self.accounts[account_id].balance_value,
+                        "currency": "EUR",
+                    },
+                    "status": "ACTIVE",
+                }
+            }
+            for account_id in page
+        ]
+        older = page and page[-1] != ids[0]
+        return {
+            "Response": response,
+            "Pagination": self._pagination(
+                "user/%d/%s" % (USER_ID, object_type),
+                count,
+                page[-1] if older else None,
+            ),
+        }
+
+    def _payments(self, account_id, params):
+        count = int(params.get("count", 10))
+        older_id = int(params["older_id"]) if "older_id" in params else None
+        account = self.accounts[account_id]
+        page = account.page(count, older_id)
+        older = page and page[-1]["id"] > account.first_id
+        return {
+            "Response": [{"Payment": payment} for payment in page],
+            "Pagination": self._pagination(
+                "user/%d/monetary-account/%d/payment" % (USER_ID, account_id),
+                count,
+                page[-1]["id"] if older else None,
+            ),
+        }
+
+    @staticmethod
+    def _pagination(path, count, older_id):
+        return {
+            "future_url": None,
+            "newer_url": None,
+            "older_url": None
+            if older_id is None
+            else "/v1/%s?count=%d&older_id=%d" % (path, count, older_id),
+        }
+
+    def api_context(self):
+        """Return an sdk ApiContext with an active session for this server"""
+        return api_context(self.uri_base, self._server_key.publickey())
+
+    def install(self):
+        """Load the api context of this server into the global BunqContext"""
+        install(self.uri_base, self._server_key.publickey())
+
+
+def api_context(uri_base, public_key_server):
+    """Return an sdk ApiContext with an active session for a fake server"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        user = converter.deserialize(endpoint.UserPerson, FakeBunq._user())
+        token = converter.deserialize(
+            session_token.SessionToken, {"token": "fake-session"}
+        )
+    context = sdk_api_context.ApiContext(_Environment(uri_base))
+    # pylint: disable=protected-access
+    context._installation_context = installation_context.InstallationContext(
+        "fake-installation", RSA.generate(1024), public_key_server
+    )
+    context._session_context = session_context.SessionContext(
+        token, datetime.datetime.now() + datetime.timedelta(days=1), user
+    )
+    return context
+
+
+def install(uri_base, public_key_server):
+    """Load the api context of a fake server into the global BunqContext"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        bunq_context.BunqContext.load_api_context(
+            api_context(uri_base, public_key_server)
+        )
+
+
+def _serve(connection, args, kwargs):
+    with FakeBunq(*args, **kwargs) as fake:
+        connection.send((fake.uri_base, fake.public_key))
+        connection.recv()  # until stopped
+
+
+class FakeBunqProcess:
+    """
+    FakeBunq running in a child process
+
+    Keeps the cpu time and memory of the server out of measurements.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(child, args, kwargs), daemon=True
+        )
+        self.uri_base = None
+        self.public_key = None
+
+    def __enter__(self):
+        self._process.start()
+        self.uri_base, self.public_key = self._connection.recv()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._connection.send("stop")
+        self._process.join()
+
+    def install(self):
+        """Load the api context of the server into the global BunqContext"""
+        install(self.uri_base, RSA.import_key(self.public_key))
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for aggregates.py
+"""
+import io
+import os
+import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.json import converter
+
+from .. import export, offline, watch
+from ..aggregates import Aggregates
+from ..ratelimit import RateLimiter
+from . import fakebunq, temp_dir
+
+
+def _history(account_id, count):
+    return export.Payments.from_records(
+        converter.serialize(p)
+        for p in fakebunq.sdk_payments(
+            fakebunq.iter_payments(account_id, count, account_id, account_id * 1000)
+        )
+    ).payments
+
+
+def _expected_totals(frame, by):
+    """Totals computed from the full history"""
+    frame = pandas.DataFrame(
+        {
+            "monetary_account_id": frame["monetary_account_id"],
+            "month": frame["created"].dt.strftime("%Y-%m"),
+            "type": frame["type"],
+            "counterparty": frame["counterparty_alias.name"],
+            "currency": frame["amount.currency"],
+            "cents": export._cents(frame["amount.value"]),
+        }
+    )
+    grouped = frame.groupby(list(by) + ["currency"])["cents"]
+    return grouped.agg(["sum", "count"]).reset_index().rename(columns={"sum": "cents"})
+
+
+class TestAggregates(unittest.TestCase):
+    """Totals updated with parts of the history equal those of the full one"""
+
+    def setUp(self):
+        self.history = pandas.concat([_history(1, 500), _history(2, 120)])
+        self.aggregates = Aggregates(":memory:")
+
+    def tearDown(self):
+        self.aggregates.close()
+
+    def _totals(self, by):
+        totals = self.aggregates.totals(by)
+        self.assertEqual(list(totals["amount"]), list(totals["cents"] / 100))
+        return totals.drop(columns="amount")
+
+    def test_incremental(self):
+        # overlapping parts in any order, every payment is counted once
+        for start, stop in ((200, 400), (0, 250), (350, 620), (100, 300)):
+            self.aggregates.update(self.history.iloc[start:stop])
+        for by in (
+            ["monetary_account_id", "month"],
+            ["month", "counterparty"],
+            ["monetary_account_id", "month", "type", "counterparty"],
+        ):
+            pandas.testing.assert_frame_equal(
+                self._totals(by), _expected_totals(self.history, by)
+            )
+
+    def test_counted_once(self):
+        self.assertEqual(self.aggregates.update(self.history), 620)
+        self.assertEqual(self.aggregates.update(self.history.iloc[:300]), 0)
+        self.assertEqual(self.aggregates.update(pandas.DataFrame()), 0)
+        self.assertEqual(
+            self._totals(["monetary_account_id"])["count"].tolist(), [500, 120]
+        )
+
+    def test_counted(self):
+        self.aggregates.update(self.history)
+        ids = pandas.Series([1000, 1250, 1499, 5000])
+        # only the given ids, not all counted ones between them
+        self.assertEqual(sorted(self.aggregates._counted(ids)), [1000, 1250, 1499])
+
+    def test_closing_balances(self):
+        self.aggregates.update(self.history.iloc[300:])
+        self.aggregates.update(self.history.iloc[:300])
+        newest = self.history.sort_values("id").groupby(
+            ["monetary_account_id", self.history["created"].dt.strftime("%Y-%m")]
+        )
+        newest = newest.last()
+        monthly = self.aggregates.closing_balances(monthly=True)
+        self.assertEqual(monthly["id"].tolist(), newest["id"].tolist())
+        self.assertEqual(
+            monthly["balance_cents"].tolist(),
+            export._cents(newest["balance_after_mutation.value"]).tolist(),
+        )
+        closing = self.aggregates.closing_balances()
+        self.assertEqual(closing["monetary_account_id"].tolist(), [1, 2])
+        self.assertEqual(
+            closing["id"].tolist(),
+            self.history.groupby("monetary_account_id")["id"].max().tolist(),
+        )
+
+    def test_unknown_key(self):
+        with self.assertRaises(ValueError):
+            self.aggregates.totals(["amount"])
+
+
+class TestCommandLine(unittest.TestCase):
+    """--aggregates of exports and watch, bunqexport totals"""
+
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.fname = os.path.join(self.tmpdir, "bunq")
+        self.path = os.path.join(self.tmpdir, "totals.db")
+
+    def _counts(self):
+        with Aggregates(self.path) as aggregates:
+            totals = aggregates.totals(["monetary_account_id"])
+        return dict(zip(totals["monetary_account_id"], totals["count"]))
+
+    def test_stream(self):
+        pages = [
+            fakebunq.sdk_payments(fakebunq.iter_payments(1, 450))[::-1][i : i + 200]
+            for i in range(0, 450, 200)
+        ]
+        with mock.patch.object(
+            export, "_iter_pages", return_value=iter(pages)
+        ), Aggregates(self.path) as aggregates:
+            export._export_stream(
+                self.fname, 1, 300, None, "acc", "raw", aggregates=aggregates
+            )
+        self.assertEqual(self._counts(), {1: 300})
+
+    def test_watch(self):
+        with fakebunq.FakeBunq({1: 250, 2: 3}) as fake, mock.patch.object(
+            export, "_setup_context", side_effect=lambda *args: fake.install()
+        ), mock.patch.object(export, "_save_context"), mock.patch.object(
+            export, "_rate_limiter", RateLimiter(None)
+        ), mock.patch.object(
+            watch.time, "sleep"
+        ):
+            args = export._parse_args(
+                export._parser(),
+                ["-o", self.fname, "--watch", "60", "--aggregates", self.path],
+            )
+            watch.watch(args, polls=2)
+        self.assertEqual(self._counts(), {1: 200, 2: 3})
+
+    def test_totals(self):
+        export._export(self.fname, export.Payments(_history(1, 50)), None, "acc", "raw")
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            offline.main(
+                ["totals", self.path, "--add", f"{self.fname}_acc.json", "--by", "type"]
+            )
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ["type", "currency", "count", "amount"])
+        self.assertEqual(sum(int(line.split()[2]) for line in lines[1:-1]), 50)
+        self.assertTrue(lines[-1].startswith("account 1: "))
+        self.assertEqual(self._counts(), {1: 50})
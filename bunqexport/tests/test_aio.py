@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for aio.py against the fake bunq api
+"""
+import asyncio
+import datetime
+import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.exception.api_exception import ApiException
+
+from .. import export
+from ..ratelimit import RateLimiter
+from . import fakebunq
+
+try:
+    from .. import aio
+except ImportError:  # pragma: no cover
+    aio = None
+
+
+@unittest.skipIf(aio is None, "aiohttp not installed")
+class TestAsync(unittest.TestCase):
+    """The async engine fetches the same as the blocking one"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = fakebunq.FakeBunq({1: 250, 2: 3, 3: 0}, savings=(2,))
+        cls.fake.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+
+    def setUp(self):
+        self.fake.requests.clear()
+
+    def _run(self, func):
+        async def run():
+            async with aio.AsyncClient(
+                self.fake.api_context(), rate_limiter=RateLimiter(None)
+            ) as client:
+                return await func(client)
+
+        return asyncio.run(run())
+
+    def test_aiter_all_payments(self):
+        async def ids(client):
+            return [p.id_ async for p in aio.aiter_all_payments(client, 1, 100)]
+
+        first_id = self.fake.accounts[1].first_id
+        self.assertEqual(self._run(ids), list(range(first_id + 249, first_id - 1, -1)))
+        self.assertEqual(self.fake.requests["payment"], 3)
+
+    def test_bounds(self):
+        first_id = self.fake.accounts[1].first_id
+
+        async def ids(client):
+            return [
+                p.id_
+                async for p in aio.aiter_all_payments(
+                    client, 1, 100, present_ids={first_id + 99}
+                )
+            ]
+
+        self.assertEqual(len(self._run(ids)), 150)
+        self.assertEqual(self.fake.requests["payment"], 2)
+
+    def test_list_accounts(self):
+        accounts = self._run(aio.list_accounts)
+        self.assertEqual(
+            sorted(accounts.ids()),
+            [(1, "Account 1"), (2, "Account 2"), (3, "Account 3")],
+        )
+        self.assertEqual(
+            accounts.balance(2), self.fake.accounts[2].balance_value + " EUR"
+        )
+
+    def test_fetch_account(self):
+        payments = self._run(lambda client: aio.fetch_account(client, 1, 120))
+        self.fake.install()
+        with mock.patch.object(export, "_rate_limiter", RateLimiter(None)):
+            expected = export.Payments.fetch_account(1, 120)
+        pandas.testing.assert_frame_equal(payments.payments, expected.payments)
+
+    def test_error(self):
+        async def missing(client):
+            return [p async for p in aio.aiter_all_payments(client, 99)]
+
+        with self.assertRaises(ApiException) as context:
+            self._run(missing)
+        self.assertEqual(context.exception.response_code, 404)
+
+    def test_session_expiry(self):
+        api_context = self.fake.api_context()
+        session_context = api_context.session_context
+
+        def reset_session():
+            session_context._expiry_time += datetime.timedelta(days=1)
+
+        async def run():
+            async with aio.AsyncClient(
+                api_context, rate_limiter=RateLimiter(None)
+            ) as client:
+                # expires while the client is open
+                session_context._expiry_time = datetime.datetime.now()
+                return await asyncio.gather(
+                    *(aio.list_accounts(client) for _ in range(3))
+                )
+
+        with mock.patch.object(
+            api_context, "reset_session", side_effect=reset_session
+        ) as reset:
+            self.assertEqual(len(asyncio.run(run())), 3)
+        reset.assert_called_once_with()
+        self.assertTrue(api_context.is_session_active())
+
+    def test_payments_as_dataframe(self):
+        frame = asyncio.run(aio.payments_as_dataframe(self.fake.api_context(), 100))
+        self.assertEqual(len(frame), 103)
+        self.assertEqual(set(frame["account_name"]), {"Account 1", "Account 2"})
+        self.assertTrue(frame["created"].is_monotonic_decreasing)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for append.py
+"""
+import os
+import unittest
+from unittest import mock
+
+from bunq.sdk.json import converter
+
+from .. import append, export, lexware
+from ..ratelimit import RateLimiter
+from . import fakebunq, temp_dir
+from .test_lexware import _VORLAGEN
+
+# the payments of account 1 of FakeBunq({1: 450})
+_ALL = fakebunq.sdk_payments(fakebunq.iter_payments(1, 450, 0, 10**8))
+
+
+def _payments(start, stop):
+    return export.Payments.from_records(
+        converter.serialize(p) for p in _ALL[start:stop]
+    )
+
+
+class _Exports(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.fname = os.path.join(self.tmpdir, "bunq")
+
+    def _read(self, account_name):
+        result = []
+        for ext in (".csv", ".json"):
+            with open(f"{self.fname}_{account_name}{ext}", "rb") as fobj:
+                result.append(fobj.read())
+        return result
+
+
+class TestNewestId(_Exports):
+    """The last exported payment is found in the tail of the files"""
+
+    def _ids(self, mode, json_lines=False):
+        export._export(self.fname, _payments(0, 300), None, "acc", mode, json_lines)
+        return append.newest_ids(f"{self.fname}_acc", ["csv", "json"])
+
+    def test_formats(self):
+        paths = {f"{self.fname}_acc.csv", f"{self.fname}_acc.json"}
+        last_id = _ALL[299].id_
+        self.assertEqual(self._ids("raw"), dict.fromkeys(paths, last_id))
+        self.assertEqual(self._ids("lexware", True), dict.fromkeys(paths, last_id))
+        self.assertEqual(
+            self._ids(lexware.read_profile(_VORLAGEN)), dict.fromkeys(paths, last_id)
+        )
+
+    def test_short_tail(self):
+        with mock.patch.object(append, "_TAIL", 16):
+            self.assertEqual(set(self._ids("raw").values()), {_ALL[299].id_})
+            self.assertEqual(set(self._ids("raw", True).values()), {_ALL[299].id_})
+
+    def test_not_appendable(self):
+        self.assertIsNone(append.newest_ids(f"{self.fname}_acc", ["csv"]))
+        export._export(self.fname, _payments(0, 0), None, "acc", "raw")
+        self.assertIsNone(append.newest_ids(f"{self.fname}_acc", ["csv"]))
+        self.assertIsNone(append.newest_ids(f"{self.fname}_acc", ["json"]))
+        export._export(self.fname, _payments(0, 3), None, "acc", "raw")
+        self.assertIsNone(append.newest_ids(f"{self.fname}_acc", ["json", "parquet"]))
+        with open(f"{self.fname}_acc.json", "a", encoding="utf-8") as fobj:
+            fobj.write(",{")
+        self.assertIsNone(append.newest_ids(f"{self.fname}_acc", ["json"]))
+
+
+class TestAppend(_Exports):
+    """Appended exports equal the exports of all payments"""
+
+    def _append(self, mode, json_lines=False):
+        export._export(self.fname, _payments(0, 300), None, "acc", mode, json_lines)
+        # overlapping parts, only the new payments are appended
+        for last, (start, stop) in ((299, (300, 301)), (300, (250, 450))):
+            ids = append.newest_ids(f"{self.fname}_acc", ["csv", "json"])
+            self.assertEqual(set(ids.values()), {_ALL[last].id_})
+            append.add_new(_payments(start, stop), mode, ids)
+        export._export(self.fname, _payments(0, 450), None, "full", mode, json_lines)
+        self.assertEqual(self._read("acc"), self._read("full"))
+
+    def test_raw(self):
+        self._append("raw")
+
+    def test_json_lines(self):
+        self._append("lexware", json_lines=True)
+
+    def test_profile(self):
+        self._append(lexware.read_profile(_VORLAGEN))
+
+    def test_run(self):
+        export._export(self.fname, _payments(0, 300), None, "Account 1", "raw")
+        with fakebunq.FakeBunq({1: 450}) as fake, mock.patch.object(
+            export, "_setup_context", side_effect=lambda *args: fake.install()
+        ), mock.patch.object(export, "_save_context"), mock.patch.object(
+            export, "_rate_limiter", RateLimiter(None)
+        ):
+            args = export._parse_args(export._parser(), ["-o", self.fname, "--append"])
+            fake.requests.clear()
+            export._run(args, output=False)
+            # the 150 new payments fit into one page
+            self.assertEqual(fake.requests["payment"], 1)
+        export._export(self.fname, _payments(0, 450), None, "full", "raw")
+        self.assertEqual(self._read("Account 1"), self._read("full"))
+
+    def test_parse_args(self):
+        for argv in (["--stream"], ["--watch", "60"], ["--format", "parquet"]):
+            with self.assertRaises(SystemExit):
+                export._parse_args(export._parser(), ["--append"] + argv)
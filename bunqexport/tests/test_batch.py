@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for batch.py
+"""
+import multiprocessing
+import os
+import unittest
+from unittest import mock
+
+from .. import batch, export
+from . import temp_dir
+
+
+def _fake_run(args, output=True):
+    """Stands in for `export._run` in the (forked) workers"""
+    assert not output
+    if "broken" in args.conf:
+        raise ValueError("broken conf")
+    return os.getpid()
+
+
+class TestBatch(unittest.TestCase):
+    """Running many confs in worker processes"""
+
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        for name in ("b.conf", "a.conf", "notes.txt"):
+            with open(os.path.join(self.tmpdir, name), "w", encoding="utf-8"):
+                pass
+
+    def test_find_confs(self):
+        confs = batch.find_confs([self.tmpdir, "other.conf"])
+        self.assertEqual(
+            confs,
+            [
+                os.path.join(self.tmpdir, "a.conf"),
+                os.path.join(self.tmpdir, "b.conf"),
+                "other.conf",
+            ],
+        )
+
+    def test_per_conf(self):
+        self.assertEqual(batch._per_conf("out/bunq", "a"), "out/bunq_a")
+        self.assertEqual(batch._per_conf("acc.json", "a"), "acc_a.json")
+        self.assertIsNone(batch._per_conf(None, "a"))
+
+    def test_conf_names(self):
+        self.assertEqual(batch._conf_names(["dir/a.conf", "b.conf"]), ["a", "b"])
+        self.assertEqual(
+            batch._conf_names(["acme/bunq.conf", "beta/bunq.conf", "a.conf"]),
+            ["acme_bunq", "beta_bunq", "a"],
+        )
+        self.assertEqual(
+            batch._conf_names(["acme/bunq.conf", "x/acme/bunq.conf"]),
+            ["acme_bunq_1", "acme_bunq_2"],
+        )
+
+    def test_conf_args(self):
+        args = export._parse_args(
+            export._parser(), ["--store", "payments.db", "--aggregates", "totals.db"]
+        )
+        conf_args = batch._conf_args("confs/a.conf", args, "a")
+        self.assertEqual(conf_args.conf, "confs/a.conf")
+        self.assertEqual(conf_args.store, "payments_a.db")
+        self.assertEqual(conf_args.aggregates, "totals_a.db")
+        self.assertIsNone(conf_args.checkpoint)
+        self.assertEqual(args.store, "payments.db")
+
+    def test_watch(self):
+        argv = ["bunqexport-batch", self.tmpdir, "--watch", "60"]
+        with mock.patch("sys.argv", argv), mock.patch("sys.stderr") as stderr:
+            with mock.patch.object(batch, "run_batch") as run_batch:
+                with self.assertRaises(SystemExit):
+                    batch.main()
+        run_batch.assert_not_called()
+        self.assertIn("--watch", "".join(c[0][0] for c in stderr.write.call_args_list))
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork", "workers must inherit the mock"
+    )
+    def test_run_batch(self):
+        metrics = os.path.join(self.tmpdir, "metrics.json")
+        args = export._parse_args(export._parser(), ["--metrics-file", metrics])
+        confs = ["a.conf", "broken.conf", "c.conf"]
+        with mock.patch.object(export, "_run", _fake_run):
+            results = batch.run_batch(confs, args, workers=2)
+        for name in ("a", "broken", "c"):
+            self.assertTrue(
+                os.path.exists(os.path.join(self.tmpdir, f"metrics_{name}.json"))
+            )
+        self.assertEqual([result.conf for result in results], confs)
+        # every conf in a fresh process
+        self.assertNotEqual(results[0].rows, results[2].rows)
+        self.assertIsNone(results[1].rows)
+        self.assertIn("broken conf", results[1].error)
+        summary = batch._summary(results).splitlines()
+        self.assertEqual(summary[2].split()[:3], ["broken.conf", "failed", "-"])
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork", "workers must inherit the mock"
+    )
+    def test_same_names(self):
+        metrics = os.path.join(self.tmpdir, "metrics.json")
+        args = export._parse_args(export._parser(), ["--metrics-file", metrics])
+        confs = [
+            os.path.join(self.tmpdir, name, "bunq.conf") for name in ("acme", "beta")
+        ]
+        with mock.patch.object(export, "_run", _fake_run):
+            batch.run_batch(confs, args, workers=2)
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.tmpdir) if name.endswith(".json")),
+            ["metrics_acme_bunq.json", "metrics_beta_bunq.json"],
+        )
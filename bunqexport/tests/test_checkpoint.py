@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for checkpoint.py
+"""
+import json
+import unittest
+
+from ..checkpoint import Checkpoint
+from .test_exports import _DATA
+
+_OPTIONS = {"count": 1000, "since": None, "until": None}
+
+
+class TestCheckpoint(unittest.TestCase):
+    """Saving pages and cursors"""
+
+    def setUp(self):
+        self.checkpoint = Checkpoint(":memory:")
+        self.records = json.loads(_DATA)[::-1]
+
+    def tearDown(self):
+        self.checkpoint.close()
+
+    def test_empty(self):
+        self.assertEqual(self.checkpoint.load(1, _OPTIONS), ([], None, False))
+
+    def test_pages(self):
+        self.checkpoint.load(1, _OPTIONS)
+        self.checkpoint.add_page(1, self.records[:2], {"count": 2, "older_id": 7})
+        self.assertEqual(
+            self.checkpoint.load(1, _OPTIONS),
+            (self.records[:2], {"count": 2, "older_id": 7}, False),
+        )
+        self.checkpoint.add_page(1, self.records[2:], None)
+        self.assertEqual(self.checkpoint.load(1, _OPTIONS), (self.records, None, True))
+        self.assertEqual(self.checkpoint.load(2, _OPTIONS), ([], None, False))
+
+    def test_other_options(self):
+        self.checkpoint.load(1, _OPTIONS)
+        self.checkpoint.add_page(1, self.records, None)
+        options = dict(_OPTIONS, since="2020-01-01 00:00:00.000000")
+        self.assertEqual(self.checkpoint.load(1, options), ([], None, False))
+        self.assertEqual(self.checkpoint.load(1, _OPTIONS), ([], None, False))
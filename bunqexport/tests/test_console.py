@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for console.py
+"""
+import unittest
+
+import pandas
+from bunq.sdk.json import converter
+
+from .. import console, export
+from . import fakebunq
+from .test_exports import _DATA
+
+
+class TestConsole(unittest.TestCase):
+    """Bounded tables and summaries of payments"""
+
+    def setUp(self):
+        self.payments = export.Payments.from_records(
+            converter.serialize(p)
+            for p in fakebunq.sdk_payments(fakebunq.iter_payments(1, 300))
+        )
+
+    def test_table(self):
+        lines = console.table(self.payments.payments, 5).splitlines()
+        self.assertEqual(len(lines), 1 + 3 + 1 + 2 + 1)
+        full = console.table(self.payments.payments, None).splitlines()
+        self.assertEqual(len(full), 301)
+        self.assertEqual(
+            [line.split() for line in lines[1:4]], [line.split() for line in full[1:4]]
+        )
+        self.assertEqual(set(lines[4].split()), {"..."})
+        self.assertEqual(
+            [line.split() for line in lines[5:7]], [line.split() for line in full[-2:]]
+        )
+        self.assertEqual(lines[-1], "300 payments, 295 not shown")
+
+    def test_short_table(self):
+        self.assertEqual(
+            console.table(export.Payments(_DATA).payments),
+            str(export.Payments(_DATA)),
+        )
+        self.assertEqual(console.table(pandas.DataFrame()), "0 payments")
+
+    def test_repr(self):
+        self.assertEqual(repr(self.payments), console.table(self.payments.payments))
+        self.assertTrue(repr(self.payments).endswith("300 payments, 280 not shown"))
+
+    def test_report(self):
+        self.assertEqual(
+            console.report("acc", self.payments, summary_only=True).splitlines()[0],
+            f"acc: {len(self.payments)} payments from"
+            f" {self.payments.payments['created'].min():%d.%m.%Y}"
+            f" to {self.payments.payments['created'].max():%d.%m.%Y}",
+        )
+        self.assertEqual(
+            console.report("acc", self.payments, 10).splitlines()[-1],
+            "300 payments, 290 not shown",
+        )
+
+    def test_summary(self):
+        self.assertEqual(
+            console.summary(export.Payments(_DATA).payments).splitlines(),
+            [
+                "4 payments from 23.12.2019 to 24.12.2019",
+                "  EUR in 700.00 out -17.00 net 683.00",
+            ],
+        )
+
+    def test_max_rows(self):
+        parser = export._parser()
+        self.assertEqual(export._parse_args(parser, []).max_rows, 20)
+        self.assertIsNone(export._parse_args(parser, ["--max-rows", "0"]).max_rows)
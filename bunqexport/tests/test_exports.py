@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 # flake8: noqa: E501
-# pylint: disable=line-too-long,missing-function-docstring
+# pylint: disable=line-too-long,missing-function-docstring,protected-access
 
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -18,11 +18,20 @@
 """
 Tests for export.py
 """
+import decimal
 import io
 import json
+import os
+import sys
+import time
 import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.json import converter
 
 from .. import export
+from . import fakebunq, temp_dir
 
 _DATA = r"""
 [
@@ -293,3 +302,270 @@ class TestPayments(unittest.TestCase):
 
     def test_len(self):
         self.assertEqual(len(self.payments), 4)
+
+
+class TestRecordsToDataframe(unittest.TestCase):
+    """The column builder must match json_normalize of the sdk json"""
+
+    def test_data(self):
+        records = json.loads(_DATA)
+        pandas.testing.assert_frame_equal(
+            export._records_to_dataframe(records), pandas.json_normalize(records)
+        )
+
+    def test_sdk_payments(self):
+        payments = fakebunq.sdk_payments(fakebunq.iter_payments(1, 50))
+        expected = pandas.json_normalize(
+            json.loads("[" + ",".join(p.to_json() for p in payments) + "]")
+        )
+        pandas.testing.assert_frame_equal(
+            export._records_to_dataframe(converter.serialize(p) for p in payments),
+            expected,
+        )
+
+    def test_missing_values(self):
+        frame = export._records_to_dataframe(
+            [{"a": {"x": 1}}, {"b": 2}, {"a": {"x": 3, "y": 4}}]
+        )
+        self.assertEqual(list(frame.columns), ["a.x", "b", "a.y"])
+        self.assertEqual(frame["a.y"].isna().tolist(), [True, True, False])
+
+    def test_payments_from_records(self):
+        fobj = io.StringIO()
+        export.Payments.from_records(json.loads(_DATA)).to_csv(fobj)
+        expected = io.StringIO()
+        export.Payments(_DATA).to_csv(expected)
+        self.assertEqual(fobj.getvalue(), expected.getvalue())
+
+
+class TestCompact(unittest.TestCase):
+    """Compact dtype layout of the payments"""
+
+    def setUp(self):
+        self.payments = export.Payments.from_records(
+            converter.serialize(p)
+            for p in fakebunq.sdk_payments(fakebunq.iter_payments(1, 500))
+        )
+        self.compact = self.payments.compact()
+
+    def test_amounts_in_cents(self):
+        self.assertEqual(self.compact["amount.cents"].dtype, "int64")
+        self.assertEqual(
+            self.compact["amount.cents"].tolist(),
+            [
+                int(decimal.Decimal(v) * 100)
+                for v in self.payments.payments["amount.value"]
+            ],
+        )
+        self.assertNotIn("amount.value", self.compact)
+
+    def test_columns(self):
+        self.assertNotIn("attachment", self.compact)
+        self.assertEqual(self.compact["type"].dtype, "category")
+        self.assertEqual(self.compact["description"].dtype, object)
+        pandas.testing.assert_series_equal(
+            self.compact["created"], self.payments.payments["created"]
+        )
+
+    def test_memory(self):
+        self.assertLess(
+            self.compact.memory_usage(deep=True).sum(),
+            self.payments.payments.memory_usage(deep=True).sum() / 2,
+        )
+
+
+class TestArrowFormats(unittest.TestCase):
+    """Parquet and feather exports keep the column types"""
+
+    def setUp(self):
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        self.payments = export.Payments(_DATA)
+        self.tmpdir = temp_dir(self)
+
+    def _check(self, frame):
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(
+            frame["amount.value"].tolist(),
+            [decimal.Decimal(v) for v in self.payments.payments["amount.value"]],
+        )
+        self.assertTrue(pandas.api.types.is_datetime64_any_dtype(frame["created"]))
+        self.assertEqual(frame["id"].dtype, "int64")
+
+    def test_parquet(self):
+        path = os.path.join(self.tmpdir, "bunq.parquet")
+        self.payments.to_parquet(path)
+        self._check(pandas.read_parquet(path))
+
+    def test_feather(self):
+        path = os.path.join(self.tmpdir, "bunq.feather")
+        self.payments.to_feather(path)
+        self._check(pandas.read_feather(path))
+
+    def test_export_formats(self):
+        fname = os.path.join(self.tmpdir, "bunq")
+        export._export(
+            fname, self.payments, None, "acc", "raw", formats=("parquet", "csv")
+        )
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)),
+            ["bunq_acc.csv", "bunq_acc.parquet"],
+        )
+
+
+class TestArrowArguments(unittest.TestCase):
+    """Arrow formats without pyarrow fail before fetching"""
+
+    def test_missing_pyarrow(self):
+        parser = export._parser()
+        with mock.patch.dict(sys.modules, {"pyarrow": None}):
+            with mock.patch.object(parser, "error", side_effect=SystemExit) as error:
+                with self.assertRaises(SystemExit):
+                    export._parse_args(parser, ["--format", "parquet"])
+            self.assertIn("bunqexport[arrow]", error.call_args[0][0])
+            export._parse_args(parser, ["--format", "csv"])
+
+    def test_repeated_format(self):
+        args = export._parse_args(
+            export._parser(), ["--format", "csv", "--format", "json", "--format", "csv"]
+        )
+        self.assertEqual(args.format, ["csv", "json"])
+
+
+class TestExportStream(unittest.TestCase):
+    """Streaming export writes the same files as the in memory export"""
+
+    def setUp(self):
+        newest_first = fakebunq.sdk_payments(fakebunq.iter_payments(1, 450))[::-1]
+        self.pages = [newest_first[i : i + 200] for i in range(0, 450, 200)]
+        self.tmpdir = temp_dir(self)
+        self.fname = os.path.join(self.tmpdir, "bunq")
+
+    def _read(self, account_name):
+        result = []
+        for ext in (".csv", ".json"):
+            with open(f"{self.fname}_{account_name}{ext}", encoding="utf-8") as fobj:
+                result.append(fobj.read())
+        return result
+
+    def _compare(self, count, json_lines=False):
+        with mock.patch.object(export, "_iter_pages", return_value=iter(self.pages)):
+            total = export._export_stream(
+                self.fname, 1, count, None, "stream", "lexware", json_lines
+            )
+        newest = [p for page in self.pages for p in page][:count]
+        payments = export.Payments.from_records(
+            converter.serialize(p) for p in reversed(newest)
+        )
+        export._export(self.fname, payments, None, "full", "lexware", json_lines)
+        self.assertEqual(total, len(newest))
+        self.assertEqual(self._read("stream"), self._read("full"))
+
+    def test_all(self):
+        self._compare(1000)
+
+    def test_count(self):
+        self._compare(300)
+
+    def test_json_lines(self):
+        self._compare(1000, json_lines=True)
+
+
+class TestFetchAccounts(unittest.TestCase):
+    """Parallel fetching must not change the order of the results"""
+
+    @staticmethod
+    def _fetch(account_id):
+        time.sleep(0.01 * (5 - account_id))  # first accounts finish last
+        return account_id * 10
+
+    def test_sequential(self):
+        self.assertEqual(
+            export._fetch_accounts(self._fetch, range(5)), [0, 10, 20, 30, 40]
+        )
+
+    def test_parallel(self):
+        self.assertEqual(
+            export._fetch_accounts(self._fetch, range(5), jobs=5),
+            [0, 10, 20, 30, 40],
+        )
+
+
+class TestMerge(unittest.TestCase):
+    """Merging newly fetched payments into df_old"""
+
+    class _Accounts:  # pylint: disable=too-few-public-methods
+        @staticmethod
+        def ids():
+            return iter([(1, "one"), (2, "two")])
+
+    @staticmethod
+    def _frame(account_id, first, last):
+        payments = fakebunq.iter_payments(account_id, 100, first_id=account_id * 1000)
+        return export.Payments.from_records(
+            converter.serialize(p) for p in fakebunq.sdk_payments(payments)[first:last]
+        ).payments
+
+    def setUp(self):
+        self.df_old = export._combine(
+            self._Accounts, lambda account_id: self._frame(account_id, 0, 50), 1
+        )
+
+    def test_present_ids(self):
+        present_ids = export._present_ids(self.df_old)
+        self.assertEqual(sorted(present_ids), [1, 2])
+        self.assertEqual(len(present_ids[2]), 50)
+        self.assertEqual(export._present_ids(None), {})
+
+    def test_append_newer(self):
+        merged = export._combine(
+            self._Accounts,
+            lambda account_id: self._frame(account_id, 50, 60),
+            1,
+            self.df_old,
+        )
+        self.assertEqual(len(merged), 120)
+        self.assertTrue(merged["created"].is_monotonic_decreasing)
+        self.assertTrue(merged["id"].is_unique)
+
+    def test_compact(self):
+        def fetch(account_id):
+            return self._frame(account_id, 50, 60)
+
+        plain = export._combine(self._Accounts, fetch, 1, self.df_old)
+        merged = export._combine(
+            self._Accounts, fetch, 1, export._compact(self.df_old), compact=True
+        )
+        self.assertEqual(merged["id"].tolist(), plain["id"].tolist())
+        self.assertEqual(merged["amount.cents"].dtype, "int64")
+        self.assertEqual(
+            merged["amount.cents"].tolist(),
+            (plain["amount.value"] * 100).round().astype("int64").tolist(),
+        )
+        self.assertEqual(merged["account_name"].dtype, "category")
+
+    def test_nothing_new(self):
+        merged = export._combine(
+            self._Accounts,
+            lambda account_id: self._frame(account_id, 0, 0),
+            1,
+            self.df_old,
+        )
+        self.assertIs(merged, self.df_old)
+
+    def test_update(self):
+        def fetch(account_id):
+            frame = self._frame(account_id, 40, 55)
+            frame.loc[frame.index[0], "updated"] += pandas.Timedelta(days=1)
+            frame.loc[frame.index[0], "description"] = "updated"
+            return frame
+
+        with self.assertLogs(export._log, "INFO") as logs:
+            merged = export._combine(self._Accounts, fetch, 1, self.df_old)
+        self.assertEqual(len(merged), 110)
+        self.assertTrue(merged["id"].is_unique)
+        self.assertTrue(merged["created"].is_monotonic_decreasing)
+        self.assertEqual((merged["description"] == "updated").sum(), 2)
+        self.assertIn("updated 2 payments", logs.output[0])
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for fetching from the (fake) bunq api
+"""
+import itertools
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.context.api_context import ApiContext
+from bunq.sdk.http import api_client
+
+from .. import connection, export
+from ..aggregates import Aggregates
+from ..checkpoint import Checkpoint
+from ..ratelimit import RateLimiter
+from ..store import PaymentStore
+from . import fakebunq, temp_dir
+
+
+def setUpModule():  # pylint: disable=invalid-name
+    # the fake api has no rate limit
+    patcher = mock.patch.object(export, "_rate_limiter", RateLimiter(None))
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+class TestFetch(unittest.TestCase):
+    """Accounts and payment pagination against FakeBunq"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = fakebunq.FakeBunq({1: 250, 2: 3, 3: 0}, savings=(2,))
+        cls.fake.start()
+        cls.fake.install()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+
+    def setUp(self):
+        self.fake.requests.clear()
+
+    def _ids(self, account_id, **kwargs):
+        return [p.id_ for p in export._iter_all_payments(account_id, 100, **kwargs)]
+
+    def test_accounts(self):
+        accounts = export.Accounts()
+        self.assertEqual(
+            sorted(accounts.ids()),
+            [(1, "Account 1"), (2, "Account 2"), (3, "Account 3")],
+        )
+
+    def test_accounts_pages(self):
+        with fakebunq.FakeBunq(
+            {i: 0 for i in range(1, 210)}, savings=(208, 209)
+        ) as fake:
+            fake.install()
+            fake.requests.clear()
+            accounts = export.Accounts()
+            self.assertEqual(len(accounts.balances), 209)
+            self.assertEqual(fake.requests["monetary-account-bank"], 2)
+            self.assertEqual(fake.requests["monetary-account-savings"], 1)
+        self.fake.install()
+
+    def test_accounts_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "accounts.json")
+            accounts = export.Accounts(cache)
+            self.fake.requests.clear()
+            cached = export.Accounts(cache)
+            self.assertEqual(cached.balances, accounts.balances)
+            self.assertEqual(self.fake.requests, {})
+            export.Accounts(cache, max_age=-1)
+            self.assertEqual(self.fake.requests["monetary-account-bank"], 1)
+
+    def test_accounts_cache_invalid(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "accounts.json")
+            for content in ("{", "{}", "[]", '{"time": 0, "balances": 1}'):
+                with open(cache, "w", encoding="utf-8") as fobj:
+                    fobj.write(content)
+                self.fake.requests.clear()
+                accounts = export.Accounts(cache, max_age=10**10)
+                self.assertEqual(len(accounts.balances), 3)
+                self.assertEqual(self.fake.requests["monetary-account-bank"], 1)
+
+    def test_accounts_cache_user(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = os.path.join(tmpdir, "accounts.json")
+            export.Accounts(cache)
+            with open(cache, encoding="utf-8") as fobj:
+                cached = json.load(fobj)
+            self.assertEqual(cached["user_id"], fakebunq.USER_ID)
+            cached["user_id"] += 1
+            with open(cache, "w", encoding="utf-8") as fobj:
+                json.dump(cached, fobj)
+            self.fake.requests.clear()
+            export.Accounts(cache)
+            self.assertEqual(self.fake.requests["monetary-account-bank"], 1)
+
+    def test_updated(self):
+        with mock.patch.object(export, "_setup_context"):
+            df_old = export.payments_as_dataframe()
+            account = self.fake.accounts[1]
+            account.updated[len(account) - 5] = "2030-01-01 00:00:00.000000"
+            self.fake.requests.clear()
+            try:
+                with self.assertLogs(export._log, "INFO") as logs:
+                    merged = export.payments_as_dataframe(df_old=df_old)
+            finally:
+                account.updated.clear()
+        self.assertIn("updated 1 payments", "\n".join(logs.output))
+        # only the newest page of every account
+        self.assertEqual(self.fake.requests["payment"], 3)
+        self.assertEqual(len(merged), len(df_old))
+        self.assertTrue(merged["id"].is_unique)
+        self.assertTrue(merged["created"].is_monotonic_decreasing)
+        updated = merged[merged["updated"] != merged["created"]]
+        self.assertEqual(updated["id"].tolist(), [account.first_id + len(account) - 5])
+        self.assertEqual(updated["updated"].iloc[0], pandas.Timestamp("2030-01-01"))
+
+    def test_compact(self):
+        totals = os.path.join(temp_dir(self), "totals.db")
+        with mock.patch.object(export, "_setup_context"):
+            frame = export.payments_as_dataframe()
+            compact = export.payments_as_dataframe(
+                compact=True, repair_gaps=True, aggregates=totals
+            )
+            # nothing new, merged into the compact frame
+            again = export.payments_as_dataframe(df_old=compact, compact=True)
+        self.assertEqual(compact["amount.cents"].dtype, "int64")
+        self.assertNotIn("amount.value", compact)
+        self.assertEqual(
+            compact["amount.cents"].tolist(),
+            (frame["amount.value"] * 100).round().astype("int64").tolist(),
+        )
+        self.assertEqual(compact["type"].dtype, "category")
+        self.assertLess(
+            compact.memory_usage(deep=True).sum(), frame.memory_usage(deep=True).sum()
+        )
+        self.assertIs(again, compact)
+        with Aggregates(totals) as aggregates:
+            self.assertEqual(
+                aggregates.totals(["monetary_account_id"])["cents"].tolist(),
+                compact.groupby("monetary_account_id")["amount.cents"].sum().tolist(),
+            )
+
+    def test_pages(self):
+        pages = list(export._iter_pages(1, 100))
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertEqual(self.fake.requests["payment"], 3)
+        ids = [p.id_ for page in pages for p in page]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_prefetch(self):
+        pages = list(export._iter_pages(1, 100, prefetch=2))
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertEqual(self.fake.requests["payment"], 3)
+        pandas.testing.assert_frame_equal(
+            export.Payments.fetch_account(1, 220, prefetch=2).payments,
+            export.Payments.fetch_account(1, 220).payments,
+        )
+
+    def test_since_id(self):
+        first_id = self.fake.accounts[1].first_id
+        self.assertEqual(
+            self._ids(1, since_id=first_id + 239),
+            list(range(first_id + 249, first_id + 239, -1)),
+        )
+        self.assertEqual(self.fake.requests["payment"], 1)
+
+    def test_present_ids(self):
+        first_id = self.fake.accounts[1].first_id
+        self.assertEqual(len(self._ids(1, present_ids={first_id + 99})), 150)
+        self.assertEqual(self.fake.requests["payment"], 2)
+
+    def test_since_until(self):
+        first_id = self.fake.accounts[1].first_id
+        created = [p["created"] for p in self.fake.accounts[1].page(250)][::-1]
+        ids = self._ids(1, since=created[120], until=created[230])
+        self.assertEqual(ids, list(range(first_id + 229, first_id + 119, -1)))
+        self.assertEqual(self.fake.requests["payment"], 2)
+
+    def test_fetch_account(self):
+        payments = export.Payments.fetch_account(2, 10)
+        self.assertEqual(len(payments), 3)
+        self.assertEqual(list(payments.payments.id), sorted(payments.payments.id))
+        self.assertEqual(len(export.Payments.fetch_account(3, 10)), 0)
+
+    def test_skip_unchanged(self):
+        accounts = export.Accounts()
+        with PaymentStore(":memory:") as store:
+            for _ in range(2):
+                self.fake.requests.clear()
+                payments = export.Payments.sync_account(
+                    store, 2, 10, accounts.balance(2)
+                )
+                self.assertEqual(len(payments), 3)
+        self.assertNotIn("payment", self.fake.requests)
+
+    def test_sync_cached_balance(self):
+        cache = os.path.join(temp_dir(self), "accounts.json")
+        with fakebunq.FakeBunq({1: 5}) as fake, PaymentStore(":memory:") as store:
+            fake.install()
+            accounts = export.Accounts(cache)
+            export.Payments.sync_account(store, 1, 10, accounts.listed_balance(1))
+            self.assertEqual(store.balance(1), accounts.balance(1))
+            # new payments after the accounts were cached
+            fake.accounts[1] = fakebunq.FakeAccount(1, 8, 0, fake.accounts[1].first_id)
+            cached = export.Accounts(cache)
+            self.assertEqual(cached.balance(1), store.balance(1))
+            self.assertIsNone(cached.listed_balance(1))
+            payments = export.Payments.sync_account(
+                store, 1, 10, cached.listed_balance(1)
+            )
+            self.assertEqual(len(payments), 8)
+        self.fake.install()
+
+
+class TestPrefetch(unittest.TestCase):
+    """Items are produced in the background, ahead of the consumer"""
+
+    def test_items(self):
+        self.assertEqual(list(export._prefetch(iter(range(10)), 3)), list(range(10)))
+        self.assertEqual(list(export._prefetch(iter(range(10)), 0)), list(range(10)))
+
+    def test_overlap(self):
+        produced = []
+        ahead = threading.Event()
+
+        def items():
+            for item in range(10):
+                produced.append(item)
+                if len(produced) == 3:
+                    ahead.set()
+                yield item
+
+        for item in export._prefetch(items(), 2):
+            if item == 0:
+                # the next items are produced while the first is processed
+                self.assertTrue(ahead.wait(5))
+            # at most the queued items and the one being put are ahead
+            self.assertLessEqual(len(produced), item + 1 + 2 + 1)
+        self.assertEqual(produced, list(range(10)))
+
+    def test_error(self):
+        def failing():
+            yield 1
+            raise ConnectionError("connection lost")
+
+        items = export._prefetch(failing(), 2)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ConnectionError):
+            next(items)
+
+    def test_stop_early(self):
+        items = export._prefetch(itertools.count(), 2)
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertNotIn("prefetch", [thread.name for thread in threading.enumerate()])
+
+
+class TestResume(unittest.TestCase):
+    """Interrupted downloads continue at the checkpoint"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = fakebunq.FakeBunq({1: 450})
+        cls.fake.start()
+        cls.fake.install()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.path = os.path.join(self.tmpdir, "checkpoint.db")
+
+    def _fetch(self, count=1000):
+        self.fake.requests.clear()
+        with Checkpoint(self.path) as checkpoint:
+            return export.Payments.fetch_account(1, count, checkpoint=checkpoint)
+
+    def _interrupt(self, pages=1):
+        iter_cursor_pages = export._iter_cursor_pages
+
+        def interrupted(*args):
+            yield from itertools.islice(iter_cursor_pages(*args), pages)
+            raise ConnectionError("connection lost")
+
+        with mock.patch.object(export, "_iter_cursor_pages", interrupted):
+            with self.assertRaises(ConnectionError):
+                self._fetch()
+
+    def test_resume(self):
+        self._interrupt()
+        payments = self._fetch()
+        self.assertEqual(self.fake.requests["payment"], 2)
+        expected = export.Payments.fetch_account(1, 1000)
+        pandas.testing.assert_frame_equal(payments.payments, expected.payments)
+        self._fetch()
+        self.assertNotIn("payment", self.fake.requests)
+
+    def test_count(self):
+        self.assertEqual(len(self._fetch(220)), 220)
+        self.assertEqual(self.fake.requests["payment"], 2)
+        self.assertEqual(len(self._fetch(220)), 220)
+        self.assertNotIn("payment", self.fake.requests)
+        self.assertEqual(len(self._fetch(300)), 300)
+        self.assertEqual(self.fake.requests["payment"], 2)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Requests of the sdk reuse the pooled connections"""
+
+    def test_keep_alive(self):
+        with fakebunq.FakeBunq({1: 250}) as fake, mock.patch.object(
+            api_client, "requests", api_client.requests
+        ):
+            fake.install()
+            connection.use_connection_pool()
+            fake.requests.clear()
+            list(export._iter_pages(1, 100))
+            self.assertEqual(fake.requests["payment"], 3)
+            self.assertEqual(fake.requests["connection"], 1)
+            # the account types are listed in parallel, one connection each
+            for _ in range(3):
+                export.Accounts()
+            self.assertLessEqual(fake.requests["connection"], 3)
+
+
+class TestSetupContext(unittest.TestCase):
+    """A valid stored session is reused without writing the conf"""
+
+    def test_reuse_session(self):
+        with fakebunq.FakeBunq({1: 1}) as fake, mock.patch.object(
+            api_client, "requests", api_client.requests
+        ):
+            context = fake.api_context()
+            with mock.patch.object(
+                ApiContext, "restore", return_value=context
+            ), mock.patch.object(ApiContext, "save") as save:
+                token = export._setup_context("bunq.conf")
+                export._save_context("bunq.conf", token)
+        self.assertEqual(token, "fake-session")
+        save.assert_not_called()
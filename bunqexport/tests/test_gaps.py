@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for gaps.py
+"""
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.json import converter
+
+from .. import export, gaps, offline
+from ..ratelimit import RateLimiter
+from ..store import PaymentStore
+from . import fakebunq
+
+
+def _history(account_id, count):
+    return export.Payments.from_records(
+        converter.serialize(p)
+        for p in fakebunq.sdk_payments(
+            fakebunq.iter_payments(account_id, count, account_id, account_id * 1000)
+        )
+    ).payments
+
+
+class TestFindGaps(unittest.TestCase):
+    """Gaps in the balance chains"""
+
+    def setUp(self):
+        self.history = _history(1, 100)
+
+    def test_complete(self):
+        self.assertTrue(gaps.find_gaps(self.history).empty)
+        self.assertTrue(gaps.find_gaps(pandas.DataFrame()).empty)
+
+    def test_gaps(self):
+        found = gaps.find_gaps(self.history.drop(index=[10, 11, 50]))
+        self.assertEqual(found["older_id"].tolist(), [1009, 1049])
+        self.assertEqual(found["newer_id"].tolist(), [1012, 1051])
+        self.assertEqual(
+            found["missing_cents"].tolist(),
+            [
+                export._cents(self.history["amount.value"][10:12]).sum(),
+                export._cents(self.history["amount.value"][50:51]).sum(),
+            ],
+        )
+
+    def test_accounts(self):
+        # newest first like payments_as_dataframe, floats like _combine
+        frame = pandas.concat([self.history.drop(index=[20]), _history(2, 50)])
+        for col in export._AMOUNT_COLUMNS:
+            frame[col] = frame[col].astype(float)
+        frame = frame.sort_values("created", ascending=False)
+        found = gaps.find_gaps(frame)
+        self.assertEqual(found["monetary_account_id"].tolist(), [1])
+        self.assertEqual(found["newer_id"].tolist(), [1021])
+
+    def test_check(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "bunq")
+            payments = export.Payments(self.history.drop(index=[10, 11]))
+            export._export(fname, payments, None, "acc", "raw")
+            with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                offline.main(["check", f"{fname}_acc.json"])
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], f"{fname}_acc.json: 1 gaps")
+        self.assertIn("missing between payment 1009", lines[1])
+
+
+class TestRepair(unittest.TestCase):
+    """Only the payments around the gaps are fetched again"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = fakebunq.FakeBunq({1: 450})
+        cls.fake.start()
+        cls.fake.install()
+        cls.patcher = mock.patch.object(export, "_rate_limiter", RateLimiter(None))
+        cls.patcher.start()
+        cls.history = export.Payments.fetch_account(1, 1000).payments
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher.stop()
+        cls.fake.stop()
+
+    def setUp(self):
+        self.fake.requests.clear()
+
+    def test_repair(self):
+        holes = self.history.drop(index=list(range(100, 150)) + [300])
+        repaired, repairs = gaps.repair(holes)
+        pandas.testing.assert_frame_equal(repaired.reset_index(drop=True), self.history)
+        first_id = self.fake.accounts[1].first_id
+        self.assertEqual(
+            [(r.older_id - first_id, r.newer_id - first_id) for r in repairs],
+            [(99, 150), (299, 301)],
+        )
+        self.assertEqual([r.fetched for r in repairs], [50, 1])
+        self.assertTrue(all(r.closed for r in repairs))
+        self.assertEqual(self.fake.requests["payment"], 2)
+
+    def test_store(self):
+        holes = self.history.drop(index=[10])
+        with PaymentStore(":memory:") as store:
+            _, repairs = gaps.repair(holes, store=store)
+            self.assertEqual(
+                [r["id"] for r in store.records(1)], [repairs[0].older_id + 1]
+            )
+
+    def test_nothing_to_repair(self):
+        repaired, repairs = gaps.repair(self.history)
+        self.assertIs(repaired, self.history)
+        self.assertEqual(repairs, [])
+        self.assertNotIn("payment", self.fake.requests)
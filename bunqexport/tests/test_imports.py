@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Start up costs: the sdk and pandas are only imported when needed
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_HEAVY = ("bunq", "pandas", "requests")
+
+
+def _python(code, *options):
+    """Run 'code' in a fresh interpreter, return (stdout, stderr)"""
+    process = subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return process.stdout, process.stderr
+
+
+def _loaded(code):
+    """Return the heavy modules loaded after running 'code'"""
+    stdout, _ = _python(
+        code + f"\nimport sys, json; print(json.dumps([m for m in {_HEAVY!r}"
+        " if m in sys.modules]))"
+    )
+    return json.loads(stdout.splitlines()[-1])
+
+
+def _import_seconds(stderr, module):
+    """Return the cumulative import time of 'module' from -X importtime"""
+    for line in stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise AssertionError(f"{module} not imported")
+
+
+class TestImports(unittest.TestCase):
+    """Import time benchmark of the command line interface"""
+
+    def test_export_module(self):
+        self.assertEqual(_loaded("import bunqexport.export"), [])
+
+    def test_help(self):
+        self.assertEqual(
+            _loaded(
+                "import sys\n"
+                "sys.argv = ['bunqexport', '--help']\n"
+                "from bunqexport import export\n"
+                "try:\n"
+                "    export.main()\n"
+                "except SystemExit:\n"
+                "    pass"
+            ),
+            [],
+        )
+
+    def test_offline_without_sdk(self):
+        self.assertEqual(
+            _loaded(
+                "import pandas\n"
+                "from bunqexport import export, gaps, offline\n"
+                "frame = pandas.DataFrame("
+                "{'created': ['2020-01-01'], 'updated': ['2020-01-01'],"
+                " 'description': ['x'], 'amount.currency': ['EUR'],"
+                " 'amount.value': ['1.00']})\n"
+                "offline.summarize(export.Payments(frame))\n"
+                "gaps.find_gaps(frame.assign(**{'id': [1],"
+                " 'monetary_account_id': [1],"
+                " 'balance_after_mutation.value': ['1.00']}))\n"
+                "export.Payments(frame).to_csv('/dev/null', 'lexware')"
+            ),
+            ["pandas"],
+        )
+
+    def test_import_time(self):
+        _, stderr = _python(
+            "import bunqexport.export; import pandas; import bunq", "-X", "importtime"
+        )
+        seconds = _import_seconds(stderr, "bunqexport.export")
+        heavy = _import_seconds(stderr, "pandas") + _import_seconds(stderr, "bunq")
+        self.assertLess(
+            seconds,
+            heavy / 4,
+            f"import bunqexport.export: {seconds:.3f}s, pandas and bunq: {heavy:.3f}s",
+        )
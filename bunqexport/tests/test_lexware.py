@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# flake8: noqa: E501
+# pylint: disable=line-too-long,missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for lexware.py
+"""
+import io
+import os
+import tempfile
+import unittest
+
+import pandas
+
+from .. import export, lexware, offline
+from .test_exports import _DATA
+
+_VORLAGEN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "Vorlagen.dat",
+)
+
+
+class TestProfile(unittest.TestCase):
+    """Read the import profiles of Vorlagen.dat"""
+
+    def test_bunq(self):
+        profile = lexware.read_profile(_VORLAGEN)
+        self.assertEqual(
+            profile.columns,
+            [
+                "created",
+                "description",
+                "id",
+                "updated",
+                "amount.currency",
+                "amount.value",
+                "counterparty_alias.name",
+                "counterparty_alias.value",
+            ],
+        )
+        self.assertEqual(
+            (profile.date_format, profile.decimal, profile.thousands),
+            ("%d.%m.%Y", ",", "."),
+        )
+        self.assertEqual((profile.delimiter, profile.quotechar), (",", '"'))
+
+    def test_other_profile(self):
+        profile = lexware.read_profile(_VORLAGEN, "T-Online Import")
+        self.assertEqual((profile.delimiter, profile.quotechar), (";", ""))
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            lexware.read_profile(_VORLAGEN, "nope")
+
+
+class TestWrite(unittest.TestCase):
+    """Write only the columns of a profile"""
+
+    def setUp(self):
+        self.payments = export.Payments(_DATA)
+        self.profile = lexware.read_profile(_VORLAGEN)
+
+    def test_csv(self):
+        fobj = io.StringIO()
+        self.payments.to_csv(fobj, self.profile)
+        self.assertEqual(
+            fobj.getvalue(),
+            ",".join(lexware.LAYOUT) + "\r\n"
+            ',,23.12.2019,bunq account top up,232997638,,,,,23.12.2019,,,,EUR,"200,00",,,bunq,,NL61BUNQYYYYYYYYYY\r\n'
+            ',,23.12.2019,Some Company ,233385317,,,,,24.12.2019,,,,EUR,"-16,96",,,Thank You,,\r\n'
+            ',,23.12.2019,,233385323,,,,,23.12.2019,,,,EUR,"-0,04",,,Felix Mustermann,,NL45BUNQZZZZZZZZZZ\r\n'
+            ',,24.12.2019,---,233569632,,,,,24.12.2019,,,,EUR,"500,00",,,Felix Mustermann,,DE831111111222222222222\r\n',
+        )
+
+    def test_amounts(self):
+        frame = pandas.DataFrame(
+            {"amount.value": ["1234567.89", "-1000.00", "-0.05", "999.99", None]}
+        )
+        self.assertEqual(
+            list(self.profile.frame(frame)["amount.value"]),
+            ["1.234.567,89", "-1.000,00", "-0,05", "999,99", ""],
+        )
+
+    def test_missing_columns(self):
+        frame = self.profile.frame(self.payments.payments.drop(columns=["updated"]))
+        self.assertEqual(list(frame.columns), list(lexware.LAYOUT))
+        self.assertEqual(set(frame["updated"]), {""})
+
+    def test_semicolon(self):
+        fobj = io.StringIO()
+        self.payments.to_csv(fobj, lexware.read_profile(_VORLAGEN, "T-Online Import"))
+        self.assertEqual(
+            fobj.getvalue().splitlines()[1],
+            ";;;;;1111111;[];PAYMENT;CHECKOUT_MERCHANT;23.12.2019;Felix Mustermann;IBAN;NL94BUNQXXXXXXXXX",
+        )
+
+
+class TestCommandLine(unittest.TestCase):
+    """--vorlagen and --profile options"""
+
+    def test_parse_args(self):
+        parser = export._parser()
+        args = export._parse_args(
+            parser, ["--mode", "lexware", "--vorlagen", _VORLAGEN]
+        )
+        self.assertIsInstance(args.mode, lexware.Profile)
+        with self.assertRaises(SystemExit):
+            export._parse_args(parser, ["--vorlagen", _VORLAGEN])
+        with self.assertRaises(SystemExit):
+            export._parse_args(
+                parser,
+                ["--mode", "lexware", "--vorlagen", _VORLAGEN, "--profile", "nope"],
+            )
+
+    def test_render(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "bunq")
+            export._export(fname, export.Payments(_DATA), None, "acc", "raw")
+            offline.main(
+                [
+                    "render",
+                    f"{fname}_acc.json",
+                    "--mode",
+                    "lexware",
+                    "--vorlagen",
+                    _VORLAGEN,
+                    "-o",
+                    f"{fname}_profile",
+                ]
+            )
+            expected = io.StringIO()
+            export.Payments(_DATA).to_csv(expected, lexware.read_profile(_VORLAGEN))
+            with open(f"{fname}_profile.csv", encoding="utf-8", newline="") as fobj:
+                self.assertEqual(fobj.read(), expected.getvalue())
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for metrics.py
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from .. import export
+from ..metrics import Metrics, registry
+from .test_exports import _DATA
+
+
+class TestMetrics(unittest.TestCase):
+    """Counters, histograms and their output formats"""
+
+    def setUp(self):
+        self.metrics = Metrics()
+        self.metrics.count("payments_total", 3, account=1)
+        self.metrics.count("payments_total", 2, account=1)
+        self.metrics.observe("stage_seconds", 0.02, stage="to_csv")
+        self.metrics.observe("stage_seconds", 3.0, stage="to_csv")
+
+    def test_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(
+            snapshot["counters"]["payments_total"],
+            [{"labels": {"account": "1"}, "value": 5}],
+        )
+        histogram = snapshot["histograms"]["stage_seconds"][0]
+        self.assertEqual(histogram["count"], 2)
+        self.assertAlmostEqual(histogram["sum"], 3.02)
+        self.assertEqual(histogram["buckets"]["0.01"], 0)
+        self.assertEqual(histogram["buckets"]["0.025"], 1)
+        self.assertEqual(histogram["buckets"]["5.0"], 2)
+
+    def test_prometheus(self):
+        lines = self.metrics.to_prometheus().splitlines()
+        self.assertIn("# TYPE bunqexport_payments_total counter", lines)
+        self.assertIn('bunqexport_payments_total{account="1"} 5', lines)
+        self.assertIn(
+            'bunqexport_stage_seconds_bucket{stage="to_csv",le="+Inf"} 2', lines
+        )
+        self.assertIn('bunqexport_stage_seconds_count{stage="to_csv"} 2', lines)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.metrics.write(os.path.join(tmpdir, "metrics.json"))
+            self.metrics.write(os.path.join(tmpdir, "metrics.prom"))
+            self.assertEqual(
+                sorted(os.listdir(tmpdir)), ["metrics.json", "metrics.prom"]
+            )
+            with open(os.path.join(tmpdir, "metrics.json"), encoding="utf-8") as fobj:
+                self.assertEqual(json.load(fobj), self.metrics.snapshot())
+
+    def test_hook_and_timer(self):
+        seen = []
+        self.metrics.add_hook(lambda *args: seen.append(args))
+        with self.metrics.timer("block_seconds", account="x"):
+            pass
+        self.metrics.count("calls_total")
+        self.assertEqual(
+            [(kind, name) for kind, name, _, _ in seen],
+            [("histogram", "block_seconds"), ("counter", "calls_total")],
+        )
+        self.assertEqual(seen[0][3], {"account": "x"})
+        self.assertEqual(self.metrics.counter_value("calls_total"), 1)
+
+    def test_reset(self):
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot(), {"counters": {}, "histograms": {}})
+
+
+class TestInstrumentation(unittest.TestCase):
+    """The export records the seconds of its stages"""
+
+    def test_stages(self):
+        seen = []
+
+        def hook(kind, name, value, labels):  # pylint: disable=unused-argument
+            seen.append(labels.get("stage"))
+
+        registry.add_hook(hook)
+        try:
+            payments = export.Payments(_DATA)
+            payments.to_csv(io.StringIO())
+            payments.to_json(io.StringIO())
+        finally:
+            registry.remove_hook(hook)
+        self.assertEqual(seen, ["normalize", "parse_dates", "to_csv", "to_json"])
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for offline.py
+"""
+import decimal
+import io
+import os
+import unittest
+from unittest import mock
+
+import pandas
+from bunq.sdk.json import converter
+
+from .. import export, offline
+from . import fakebunq, temp_dir
+
+
+class TestOffline(unittest.TestCase):
+    """Render and summarize saved json exports"""
+
+    def setUp(self):
+        self.payments = export.Payments.from_records(
+            converter.serialize(p)
+            for p in fakebunq.sdk_payments(fakebunq.iter_payments(1, 300))
+        )
+        self.tmpdir = temp_dir(self)
+        self.fname = os.path.join(self.tmpdir, "bunq")
+
+    def _read(self, path):
+        with open(path, encoding="utf-8") as fobj:
+            return fobj.read()
+
+    def _render(self, json_lines=False):
+        export._export(self.fname, self.payments, None, "acc", "lexware", json_lines)
+        offline.main(
+            [
+                "render",
+                f"{self.fname}_acc.json",
+                "--mode",
+                "lexware",
+                "-o",
+                f"{self.fname}_rendered",
+            ]
+        )
+        self.assertEqual(
+            self._read(f"{self.fname}_rendered.csv"),
+            self._read(f"{self.fname}_acc.csv"),
+        )
+
+    def test_render_lexware(self):
+        self._render()
+
+    def test_render_json_lines(self):
+        self._render(json_lines=True)
+
+    def test_render_not_overwriting(self):
+        export._export(self.fname, self.payments, None, "acc", "raw")
+        before = self._read(f"{self.fname}_acc.json")
+        offline.main(["render", f"{self.fname}_acc.json", "--format", "json"])
+        self.assertEqual(self._read(f"{self.fname}_acc.json"), before)
+
+    def test_summary(self):
+        export._export(self.fname, self.payments, None, "acc", "raw")
+        summary = offline.summarize(offline.load_export(f"{self.fname}_acc.json"))
+        amounts = [decimal.Decimal(v) for v in self.payments.payments["amount.value"]]
+        created = self.payments.payments["created"]
+        self.assertEqual(
+            summary.splitlines(),
+            [
+                f"300 payments from {created.min():%d.%m.%Y}"
+                f" to {created.max():%d.%m.%Y}",
+                f"  EUR in {sum(a for a in amounts if a > 0):.2f}"
+                f" out {sum(a for a in amounts if a < 0):.2f}"
+                f" net {sum(amounts):.2f}",
+            ],
+        )
+
+    def test_summary_empty(self):
+        export._export(
+            self.fname, export.Payments(pandas.DataFrame()), None, "acc", "raw"
+        )
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            offline.main(["summary", f"{self.fname}_acc.json"])
+        self.assertEqual(stdout.getvalue(), f"{self.fname}_acc.json: 0 payments\n")
+
+    def test_dispatch(self):
+        with mock.patch.object(offline, "main") as offline_main, mock.patch(
+            "sys.argv", ["bunqexport", "summary", "x.json"]
+        ):
+            export.main()
+        offline_main.assert_called_once_with(["summary", "x.json"])
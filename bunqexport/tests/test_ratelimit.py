@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for ratelimit.py
+"""
+import time
+import unittest
+from unittest import mock
+
+from bunq.sdk.exception.not_found_exception import NotFoundException
+from bunq.sdk.exception.too_many_requests_exception import TooManyRequestsException
+
+from .. import export
+from ..ratelimit import RateLimiter
+from . import fakebunq
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Sliding window of requests per endpoint and retries"""
+
+    def test_limit(self):
+        limiter = RateLimiter((3, 0.3))
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire("Payment")
+        limiter.acquire("User")
+        self.assertGreaterEqual(time.monotonic() - start, 0.25)
+
+    def test_retry(self):
+        func = mock.Mock(
+            side_effect=[
+                TooManyRequestsException("slow down", 429, "id"),
+                TooManyRequestsException("slow down", 429, "id"),
+                "result",
+            ]
+        )
+        limiter = RateLimiter(None, backoff=0.001)
+        self.assertEqual(limiter.call("Payment", func, 1, a=2), "result")
+        self.assertEqual(func.call_count, 3)
+        func.assert_called_with(1, a=2)
+
+    def test_give_up(self):
+        func = mock.Mock(side_effect=TooManyRequestsException("slow", 429, "id"))
+        limiter = RateLimiter(None, retries=2, backoff=0.001)
+        self.assertRaises(TooManyRequestsException, limiter.call, "Payment", func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_no_retry(self):
+        func = mock.Mock(side_effect=NotFoundException("gone", 404, "id"))
+        limiter = RateLimiter(None, backoff=0.001)
+        self.assertRaises(NotFoundException, limiter.call, "Payment", func)
+        self.assertEqual(func.call_count, 1)
+
+
+class TestRateLimitedFetch(unittest.TestCase):
+    """Paginating against a rate limited server"""
+
+    def _fetch(self, limiter):
+        with fakebunq.FakeBunq({1: 30}, rate_limit=(3, 0.3)) as fake:
+            fake.install()
+            with mock.patch.object(export, "_rate_limiter", limiter):
+                pages = list(export._iter_pages(1, 2))
+        self.assertEqual(sum(len(page) for page in pages), 30)
+        return fake.requests
+
+    def test_within_limit(self):
+        self.assertNotIn("429", self._fetch(RateLimiter((3, 0.3))))
+
+    def test_backoff(self):
+        requests = self._fetch(RateLimiter(None, backoff=0.05))
+        self.assertGreater(requests["429"], 0)
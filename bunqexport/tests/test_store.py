@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for store.py
+"""
+import json
+import unittest
+from unittest import mock
+
+from .. import export
+from ..store import PaymentStore
+from .test_exports import _DATA
+
+
+class TestPaymentStore(unittest.TestCase):
+    """Storing payments and watermarks"""
+
+    def setUp(self):
+        self.store = PaymentStore(":memory:")
+        self.records = json.loads(_DATA)
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_empty(self):
+        self.assertIsNone(self.store.watermark(1111111))
+        self.assertEqual(self.store.records(1111111), [])
+
+    def test_add(self):
+        self.store.add(1111111, self.records[2:])
+        self.store.add(1111111, self.records[:2])
+        self.assertEqual(self.store.watermark(1111111), 233569632)
+        self.assertEqual(self.store.records(1111111), self.records)
+        self.assertEqual(self.store.records(2222222), [])
+
+    def test_replace(self):
+        self.store.add(1111111, self.records)
+        updated = dict(self.records[1], description="updated")
+        self.store.add(1111111, [updated])
+        self.assertEqual(self.store.records(1111111)[1], updated)
+        self.assertEqual(self.store.watermark(1111111), 233569632)
+
+    def test_sync_account(self):
+        self.store.add(1111111, self.records[:2])
+        with mock.patch.object(
+            export, "_get_all_payments", return_value=[]
+        ) as get_all_payments:
+            payments = export.Payments.sync_account(self.store, 1111111, 10)
+        get_all_payments.assert_called_once_with(
+            export.sys.maxsize, 1111111, since_id=233385317
+        )
+        self.assertEqual(len(payments), 2)
+
+    def test_balance(self):
+        self.assertIsNone(self.store.balance(1111111))
+        self.store.set_balance(1111111, "1.00 EUR")
+        self.store.set_balance(1111111, "2.00 EUR")
+        self.assertEqual(self.store.balance(1111111), "2.00 EUR")
+
+    def test_skip_unchanged(self):
+        self.store.add(1111111, self.records)
+        self.store.set_balance(1111111, "1.00 EUR")
+        with mock.patch.object(export, "_get_all_payments") as get_all_payments:
+            with self.assertLogs(export._log, "INFO") as logs:
+                payments = export.Payments.sync_account(
+                    self.store, 1111111, 10, "1.00 EUR"
+                )
+        get_all_payments.assert_not_called()
+        self.assertEqual(len(payments), 4)
+        self.assertIn("account 1111111 unchanged", logs.output[0])
+
+    def test_sync_changed(self):
+        self.store.add(1111111, self.records)
+        self.store.set_balance(1111111, "1.00 EUR")
+        with mock.patch.object(
+            export, "_get_all_payments", return_value=[]
+        ) as get_all_payments:
+            export.Payments.sync_account(self.store, 1111111, 10, "2.00 EUR")
+        get_all_payments.assert_called_once()
+        self.assertEqual(self.store.balance(1111111), "2.00 EUR")
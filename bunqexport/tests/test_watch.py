@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=missing-function-docstring,protected-access
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for watch.py
+"""
+import datetime
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from bunq.sdk.context.bunq_context import BunqContext
+from bunq.sdk.json import converter
+
+from .. import export, watch
+from ..ratelimit import RateLimiter
+from . import fakebunq, temp_dir
+
+
+class TestWatch(unittest.TestCase):
+    """Polling adds new payments to the exports"""
+
+    class _Accounts:  # pylint: disable=too-few-public-methods
+        @staticmethod
+        def ids():
+            return iter([(1, "one")])
+
+    def setUp(self):
+        self.payments = fakebunq.sdk_payments(fakebunq.iter_payments(1, 60))
+        self.available = 50
+        # indexes of payments missing in the listings
+        self.missing = set()
+        self.tmpdir = temp_dir(self)
+        self.fname = os.path.join(self.tmpdir, "bunq")
+
+    def _fetch_account(  # pylint: disable=too-many-arguments,unused-argument
+        self,
+        account_id,
+        count,
+        present_ids=None,
+        since_id=None,
+        since=None,
+        until=None,
+        checkpoint=None,
+        prefetch=0,
+    ):
+        return export.Payments.from_records(
+            converter.serialize(p)
+            for index, p in enumerate(self.payments[: self.available])
+            if (since_id is None or p.id_ > since_id) and index not in self.missing
+        )
+
+    def _read(self, name):
+        result = []
+        for ext in (".csv", ".json"):
+            with open(f"{self.fname}_{name}{ext}", encoding="utf-8") as fobj:
+                result.append(fobj.read())
+        return result
+
+    def _poll(self, argv):
+        args = export._parse_args(export._parser(), ["-o", self.fname] + argv)
+        exports = {}
+        with mock.patch.object(
+            export, "Accounts", return_value=self._Accounts
+        ), mock.patch.object(
+            export.Payments, "fetch_account", side_effect=self._fetch_account
+        ) as fetch_account:
+            self.assertEqual(watch._poll(args, None, exports, False), 50)
+            self.available = 60
+            # the new payments are appended, the exports not written again
+            with mock.patch.object(export, "_write") as write:
+                self.assertEqual(watch._poll(args, None, exports, False), 10)
+                self.assertEqual(watch._poll(args, None, exports, False), 0)
+            write.assert_not_called()
+        self.assertEqual(
+            fetch_account.call_args.kwargs["since_id"], self.payments[59].id_
+        )
+        self.assertEqual(len(exports[1]), 60)
+        export._export(
+            self.fname,
+            export.Payments.from_records(converter.serialize(p) for p in self.payments),
+            None,
+            "full",
+            args.mode,
+            args.json_lines,
+        )
+        self.assertEqual(self._read("one"), self._read("full"))
+
+    def test_append(self):
+        self._poll(["--json-lines", "--mode", "lexware"])
+
+    def test_rewrite_json(self):
+        self._poll([])
+
+    def test_repair_gaps(self):
+        # the first new payment is missing, the gap is after the exported ones
+        self.missing = {50, 55}
+
+        def refetch(account_id, older_id, newer_id, prefetch=0):
+            return [
+                converter.serialize(p)
+                for p in reversed(self.payments)
+                if older_id < p.id_ < newer_id
+            ]
+
+        with mock.patch("bunqexport.gaps._refetch", side_effect=refetch) as refetched:
+            self._poll(["--repair-gaps"])
+        ids = [self.payments[i].id_ for i in (49, 51, 54, 56)]
+        self.assertEqual(
+            [c.args[1:3] for c in refetched.call_args_list],
+            [tuple(ids[:2]), tuple(ids[2:])],
+        )
+
+
+class TestSessionKeeper(unittest.TestCase):
+    """The session is refreshed before it expires"""
+
+    def test_refresh(self):
+        api_context = mock.Mock(_TIME_TO_SESSION_EXPIRY_MINIMUM_SECONDS=30)
+        api_context.session_context.expiry_time = datetime.datetime.now() + (
+            datetime.timedelta(seconds=30 + watch._SessionKeeper.AHEAD + 0.2)
+        )
+        refreshed = threading.Event()
+
+        def reset_session():
+            api_context.session_context.expiry_time += datetime.timedelta(days=1)
+            refreshed.set()
+
+        api_context.reset_session.side_effect = reset_session
+        bunq_context = BunqContext
+        with mock.patch.object(
+            bunq_context, "api_context", return_value=api_context
+        ), mock.patch.object(bunq_context, "update_api_context"):
+            keeper = watch._SessionKeeper("bunq.conf", threading.Lock())
+            keeper.start()
+            self.assertTrue(refreshed.wait(5))
+            keeper.stop()
+            keeper.join(5)
+        api_context.save.assert_called_once_with("bunq.conf")
+
+
+class TestWatchFake(unittest.TestCase):
+    """Watch mode polls every account once per interval"""
+
+    def test_polls(self):
+        with fakebunq.FakeBunq(
+            {1: 250, 2: 3}
+        ) as fake, tempfile.TemporaryDirectory() as tmpdir, mock.patch.object(
+            export, "_setup_context", side_effect=lambda *args: fake.install()
+        ), mock.patch.object(
+            export, "_save_context"
+        ), mock.patch.object(
+            export, "_rate_limiter", RateLimiter(None)
+        ), mock.patch.object(
+            watch.time, "sleep"
+        ) as sleep:
+            args = export._parse_args(
+                export._parser(),
+                [
+                    "-o",
+                    os.path.join(tmpdir, "bunq"),
+                    "--watch",
+                    "60",
+                    "--payments",
+                    "250",
+                    "--accounts-cache",
+                    os.path.join(tmpdir, "accounts.json"),
+                ],
+            )
+            fake.requests.clear()
+            watch.watch(args, polls=3)
+            self.assertEqual(sleep.call_count, 2)
+            # two pages of account 1, then one request per account and poll
+            self.assertEqual(fake.requests["payment"], 2 + 1 + 2 * 2)
+            # the accounts are listed once, then read from the cache
+            self.assertEqual(fake.requests["monetary-account-savings"], 1)
+            self.assertEqual(len(os.listdir(tmpdir)), 5)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Long running export, `bunqexport --watch SECONDS`.
+
+The first poll exports like a normal run. Later polls only fetch payments
+newer than the exported ones and add them to the exports, while the api
+context stays loaded and its session is refreshed in the background.
+"""
+
+import datetime
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+import bunq.sdk.context.bunq_context
+import pandas
+from bunq.sdk.model import generated
+
+from . import append, export
+from .metrics import registry
+from .store import PaymentStore
+
+# pylint: disable=protected-access
+
+__all__ = ["watch"]
+
+_log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _export_new(  # pylint: disable=too-many-arguments
+    fname,
+    payments,
+    new,
+    user,
+    account_name,
+    mode,
+    json_lines=False,
+    formats=export._FORMATS[:2],
+):
+    """Add the 'new' payments to the exports of 'payments' (which include them).
+
+    The new payments are appended to existing csv and json exports (see
+    `append.append`), other formats are written again."""
+    fname = export._export_name(fname, user, account_name)
+    for fmt in formats:
+        path = f"{fname}.{fmt}"
+        if fmt in append.APPENDABLE and os.path.exists(path):
+            append.append(path, new, mode)
+        else:
+            export._write(path, fmt, payments, mode, json_lines)
+
+
+def _newest_id(payments):
+    """Return the id of the newest payment or None if there are none"""
+    if "id" not in payments.payments or payments.payments.empty:
+        return None
+    return int(payments.payments["id"].max())
+
+
+class _SessionKeeper(threading.Thread):
+    """
+    refresh the session of the `BunqContext` before it expires
+
+    holds 'lock' while refreshing, the new session is saved to 'conf'
+    """
+
+    # seconds before the expiry (as seen by the sdk) to refresh the session
+    AHEAD = 60
+    # seconds to wait after a failed refresh
+    RETRY = 30
+
+    def __init__(self, conf, lock):
+        super().__init__(name="session-keeper", daemon=True)
+        self.conf = conf
+        self.lock = lock
+        self._stopped = threading.Event()
+
+    def _wait(self):
+        api_context = bunq.sdk.context.bunq_context.BunqContext.api_context()
+        expiry = api_context.session_context.expiry_time
+        remaining = (expiry - datetime.datetime.now()).total_seconds()
+        return max(
+            0,
+            remaining
+            - api_context._TIME_TO_SESSION_EXPIRY_MINIMUM_SECONDS
+            - self.AHEAD,
+        )
+
+    def run(self):
+        wait = self._wait()
+        while not self._stopped.wait(wait):
+            try:
+                with self.lock:
+                    api_context = (
+                        bunq.sdk.context.bunq_context.BunqContext.api_context()
+                    )
+                    api_context.reset_session()
+                    api_context.save(self.conf)
+                    bunq.sdk.context.bunq_context.BunqContext.update_api_context(
+                        api_context
+                    )
+                _log.info(
+                    "Refreshed session, expires %s",
+                    api_context.session_context.expiry_time,
+                )
+                wait = self._wait()
+            except Exception:  # pylint: disable=broad-except
+                _log.exception("Refreshing the session failed")
+                wait = self.RETRY
+
+    def stop(self):
+        """Stop refreshing"""
+        self._stopped.set()
+
+
+def _repair_gaps(payments, old=None, store=None, prefetch=0):
+    """Return the `Payments` 'payments' with the ones missing in their balance
+    chain, which starts at the newest payment of 'old' if given, see `gaps`"""
+    frame = payments.payments
+    newest = None
+    if old is not None and not old.payments.empty:
+        newest = old.payments[old.payments["id"] == _newest_id(old)]
+        frame = pandas.concat([newest, frame])
+    if frame.empty:
+        return payments
+    repaired = export._repair_gaps(frame, store, prefetch)
+    if newest is not None:
+        repaired = repaired[~repaired["id"].isin(newest["id"])]
+    return export.Payments(repaired)
+
+
+def _poll(args, user, exports, output=True):  # pylint: disable=too-many-locals
+    """Export the payments newer than the ones in 'exports' for all accounts.
+
+    'exports' maps account ids to the exported `Payments`, accounts not in it
+    are exported like by a normal run. Returns the number of new payments."""
+    accounts = export.Accounts(args.accounts_cache, args.accounts_cache_ttl)
+    account_names = dict(accounts.ids())
+    payment_store = None if args.store is None else PaymentStore(args.store)
+
+    def fetch(account_id):
+        old = exports.get(account_id)
+        if payment_store is not None:
+            payments = export.Payments.sync_account(
+                payment_store,
+                account_id,
+                args.payments,
+                accounts.listed_balance(account_id),
+            )
+            old = None
+        elif old is None:
+            payments = export.Payments.fetch_account(
+                account_id,
+                args.payments,
+                since=args.since,
+                until=args.until,
+                prefetch=args.prefetch,
+            )
+        else:
+            payments = export.Payments.fetch_account(
+                account_id,
+                sys.maxsize,
+                since_id=_newest_id(old),
+                until=args.until,
+            )
+        if args.repair_gaps:
+            payments = _repair_gaps(payments, old, payment_store, args.prefetch)
+        return payments
+
+    try:
+        all_payments = export._fetch_accounts(fetch, list(account_names), args.jobs)
+    finally:
+        if payment_store is not None:
+            payment_store.close()
+    rows = 0
+    for (account_id, account_name), payments in zip(
+        account_names.items(), all_payments
+    ):
+        old = exports.get(account_id)
+        if old is None:
+            export._export(
+                args.outfile,
+                payments,
+                user,
+                account_name,
+                args.mode,
+                args.json_lines,
+                args.format,
+            )
+            exports[account_id] = new = payments
+        else:
+            newest_id = _newest_id(old)
+            new = payments
+            if newest_id is not None and not payments.payments.empty:
+                new = export.Payments(
+                    payments.payments[payments.payments["id"] > newest_id]
+                )
+            if new.payments.empty:
+                continue
+            combined = export.Payments(pandas.concat([old.payments, new.payments]))
+            _export_new(
+                args.outfile,
+                combined,
+                new,
+                user,
+                account_name,
+                args.mode,
+                args.json_lines,
+                args.format,
+            )
+            exports[account_id] = combined
+        export._aggregate(args.aggregates, new.payments)
+        rows += len(new)
+        if output and len(new) > 0:
+            print(export._report(args, account_name, new))
+    return rows
+
+
+def watch(args, polls=None):
+    """Export like `bunqexport`, then poll for new payments every 'args.watch'
+    seconds (stop after 'polls' polls if given).
+
+    The session is kept alive in the background, new payments are added to
+    the exports."""
+    token = export._setup_context(args.conf, max(10, args.jobs))
+    user = export._api_call("User", generated.endpoint.User.get)
+    user = user.value.get_referenced_object()
+    lock = threading.Lock()
+    keeper = _SessionKeeper(args.conf, lock)
+    keeper.start()
+    exports = {}
+    try:
+        for poll in itertools.count(1):
+            with lock:
+                rows = _poll(args, user, exports)
+            registry.count("watch_polls_total")
+            if args.metrics_file:
+                registry.write(args.metrics_file)
+            if polls is not None and poll >= polls:
+                break
+            _log.info("%d new payments, next poll in %ds", rows, args.watch)
+            time.sleep(args.watch)
+    finally:
+        keeper.stop()
+        with lock:
+            export._save_context(args.conf, token)
@@ -46,10 +46,13 @@ setup(
     install_requires=REQUIREMENTS,
     extras_require={
         "dev": REQUIREMENTSDEV,
+        "arrow": ["pyarrow"],
+        "async": ["aiohttp"],
     },
     entry_points={
         "console_scripts": [
             "bunqexport = bunqexport.export:main",
+            "bunqexport-batch = bunqexport.batch:main",
         ],
     },
     include_package_data=True,